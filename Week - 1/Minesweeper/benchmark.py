@@ -0,0 +1,157 @@
+import argparse
+import random
+import time
+
+from minesweeper import (
+    GUESSES, ArrayMinesweeper, BitMinesweeperAI, Minesweeper, MinesweeperAI
+)
+
+# Board configurations to benchmark, as (height, width, mines)
+CONFIGS = [
+    (8, 8, 8),
+    (16, 16, 40),
+    (16, 30, 99),
+    (100, 100, 1000),
+    (100, 100, 2000),
+]
+
+GAMES = 100
+
+BOARDS = {
+    "list": Minesweeper,
+    "numpy": ArrayMinesweeper
+}
+
+AIS = {
+    "set": MinesweeperAI,
+    "bitset": BitMinesweeperAI
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play headless Minesweeper games with the AI."
+    )
+    parser.add_argument("-n", "--games", type=int, default=GAMES,
+                        help="games to play per configuration")
+    parser.add_argument("-c", "--config", action="append",
+                        metavar="HxWxM",
+                        help="board configuration, e.g. 1000x1000x5000")
+    parser.add_argument("-s", "--seed", type=int, default=None)
+    parser.add_argument("--board", choices=BOARDS, default="list",
+                        help="game board representation")
+    parser.add_argument("--ai", choices=AIS, default="set",
+                        help="knowledge base representation")
+    parser.add_argument("--guess", choices=GUESSES, default="random",
+                        help="how the AI guesses when no move is safe")
+    args = parser.parse_args()
+
+    configs = [parse_config(c) for c in args.config or []] or CONFIGS
+    random.seed(args.seed)
+
+    print(f"{'board':>16} {'games':>6} {'win rate':>9} "
+          f"{'moves/sec':>10} {'peak kb':>8}")
+    for height, width, mines in configs:
+        stats = benchmark(height, width, mines, args.games, AIS[args.ai],
+                          guess=args.guess, board_class=BOARDS[args.board])
+        print(f"{height:>6}x{width:<5}{mines:>5} {stats['games']:>6} "
+              f"{stats['win_rate']:>9.3f} {stats['moves_per_sec']:>10.0f} "
+              f"{stats['peak_knowledge']:>8}")
+
+
+def parse_config(config):
+    """
+    Parse a board configuration of the form HEIGHTxWIDTHxMINES.
+    """
+    try:
+        height, width, mines = (int(x) for x in config.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid board: {config}")
+    return height, width, mines
+
+
+def play_game(game, ai):
+    """
+    Play `game` with `ai` until a mine is hit or every safe cell has been
+    revealed. Return a dictionary describing how the game went, including
+    the seconds the AI spent updating its knowledge and guessing.
+
+    Games that can reveal whole regions at once tell the AI about every
+    cell a move uncovers.
+    """
+    safe_cells = game.height * game.width - len(game.mines)
+    moves = 0
+    guesses = 0
+    peak_knowledge = 0
+    inference_time = 0.0
+    won = False
+
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            start = time.perf_counter()
+            move = ai.make_random_move()
+            inference_time += time.perf_counter() - start
+            if move is None:
+                break
+            guesses += 1
+        moves += 1
+
+        if game.is_mine(move):
+            break
+        revealed = game.reveal(move) if hasattr(game, "reveal") else [move]
+        start = time.perf_counter()
+        for cell in revealed:
+            if cell not in ai.moves_made:
+                ai.add_knowledge(cell, game.nearby_mines(cell))
+        inference_time += time.perf_counter() - start
+        peak_knowledge = max(peak_knowledge, len(ai.knowledge))
+
+        # Every remaining cell is a mine, so they can all be flagged
+        if len(ai.moves_made) == safe_cells:
+            game.mines_found = game.mines.copy()
+            won = game.won()
+            break
+
+    return {
+        "won": won,
+        "moves": moves,
+        "guesses": guesses,
+        "peak_knowledge": peak_knowledge,
+        "inference_time": inference_time
+    }
+
+
+def benchmark(height, width, mines, games, ai_class=MinesweeperAI,
+              guess="random", board_class=Minesweeper):
+    """
+    Play `games` games on `board_class` boards of the given size with
+    players of `ai_class` guessing with `guess`, and return the win rate,
+    moves per second and peak knowledge base size.
+    """
+    wins = 0
+    moves = 0
+    peak_knowledge = 0
+    elapsed = 0.0
+    for _ in range(games):
+        game = board_class(height=height, width=width, mines=mines)
+        ai = ai_class(height=height, width=width, mines=mines, guess=guess)
+
+        start = time.perf_counter()
+        result = play_game(game, ai)
+        elapsed += time.perf_counter() - start
+
+        wins += result["won"]
+        moves += result["moves"]
+        peak_knowledge = max(peak_knowledge, result["peak_knowledge"])
+
+    return {
+        "games": games,
+        "win_rate": wins / games if games else 0.0,
+        "moves_per_sec": moves / elapsed if elapsed else 0.0,
+        "peak_knowledge": peak_knowledge
+    }
+
+
+if __name__ == "__main__":
+    main()
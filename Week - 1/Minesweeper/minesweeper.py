@@ -1,6 +1,15 @@
+import collections
 import itertools
+import math
 import random
 import copy
+import time
+
+# Guessing strategies for MinesweeperAI.make_random_move
+GUESSES = ("random", "probable")
+
+# Seconds the probable guess may spend enumerating mine configurations
+TIME_BUDGET = 0.1
 
 
 class Minesweeper():
@@ -15,6 +24,10 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
+        # A board can hold at most one mine per cell
+        if not 0 <= mines <= height * width:
+            raise ValueError("mines must be between 0 and height * width")
+
         # Initialize an empty field with no mines
         self.board = []
         for i in range(self.height):
@@ -85,6 +98,127 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class ArrayMinesweeper(Minesweeper):
+    """
+    Minesweeper game backed by NumPy arrays, for large boards.
+    Mines are sampled in one draw, every cell's count of nearby mines
+    is computed up front, and zero regions are revealed in bulk.
+    """
+
+    def __init__(self, height=8, width=8, mines=8, seed=None):
+        import numpy as np
+
+        if not 0 <= mines <= height * width:
+            raise ValueError("mines must be between 0 and height * width")
+        self.height = height
+        self.width = width
+
+        # Draw from the global RNG when unseeded, so that seeding
+        # `random` makes array boards reproducible too
+        if seed is None:
+            seed = random.getrandbits(64)
+        rng = np.random.default_rng(seed)
+        positions = rng.choice(height * width, size=mines, replace=False)
+        self.board = np.zeros(height * width, dtype=bool)
+        self.board[positions] = True
+        self.board = self.board.reshape(height, width)
+        self.mines = set(
+            (int(k) // width, int(k) % width) for k in positions
+        )
+
+        # Convolve the board with a 3x3 kernel of ones, as a sum of
+        # shifted views of the padded board, and drop the cell itself
+        padded = np.pad(self.board.astype(np.int8), 1)
+        self.counts = sum(
+            padded[di:di + height, dj:dj + width]
+            for di in range(3) for dj in range(3)
+        ) - self.board
+
+        # Connected regions of safe cells with no nearby mines and
+        # their bounding boxes, labelled the first time one is revealed
+        self.regions = None
+        self.boxes = None
+
+        self.mines_found = set()
+
+    def is_mine(self, cell):
+        return bool(self.board[cell])
+
+    def nearby_mines(self, cell):
+        return int(self.counts[cell])
+
+    def label_regions(self):
+        """
+        Labels each 8-connected region of safe zero-count cells with a
+        distinct positive integer, and every other cell with 0.
+        Returns the labels and, for each region, the pair of slices
+        bounding it.
+        """
+        import numpy as np
+
+        zeros = (self.counts == 0) & ~self.board
+        try:
+            from scipy import ndimage
+        except ImportError:
+            ndimage = None
+        if ndimage is not None:
+            labels, _ = ndimage.label(zeros, structure=np.ones((3, 3)))
+            return labels, ndimage.find_objects(labels)
+
+        labels = np.zeros((self.height, self.width), dtype=np.int32)
+        boxes = []
+        for start in zip(*np.nonzero(zeros)):
+            if labels[start]:
+                continue
+            boxes.append(None)
+            labels[start] = len(boxes)
+            top, left = bottom, right = start
+            frontier = [start]
+            while frontier:
+                i, j = frontier.pop()
+                top, bottom = min(top, i), max(bottom, i)
+                left, right = min(left, j), max(right, j)
+                for x in range(max(i - 1, 0), min(i + 2, self.height)):
+                    for y in range(max(j - 1, 0), min(j + 2, self.width)):
+                        if zeros[x, y] and not labels[x, y]:
+                            labels[x, y] = len(boxes)
+                            frontier.append((x, y))
+            boxes[-1] = (slice(top, bottom + 1), slice(left, right + 1))
+        return labels, boxes
+
+    def reveal(self, cell):
+        """
+        Returns the list of cells uncovered by clicking a safe `cell`:
+        the cell itself, or if it has no nearby mines, its whole region
+        of such cells together with the cells bordering that region.
+        """
+        import numpy as np
+
+        if self.counts[cell] != 0:
+            return [cell]
+        if self.regions is None:
+            self.regions, self.boxes = self.label_regions()
+        label = self.regions[cell]
+        rows, columns = self.boxes[label - 1]
+
+        # Work within the region's bounding box, one cell larger on
+        # every side, and grow the region by one cell in each direction
+        top, left = max(rows.start - 1, 0), max(columns.start - 1, 0)
+        box = self.regions[
+            top:min(rows.stop + 1, self.height),
+            left:min(columns.stop + 1, self.width)
+        ]
+        region = box == label
+        height, width = region.shape
+        padded = np.pad(region, 1)
+        revealed = np.zeros_like(region)
+        for di in range(3):
+            for dj in range(3):
+                revealed |= padded[di:di + height, dj:dj + width]
+        cells = np.argwhere(revealed) + (top, left)
+        return list(map(tuple, cells.tolist()))
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -99,6 +233,12 @@ class Sentence():
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -139,17 +279,262 @@ class Sentence():
         #raise NotImplementedError
 
 
+class BitSentence():
+    """
+    Sentence whose cells are stored as a bitmask of board indices
+    (`i * width + j`). The mask is kept relative to its lowest set cell,
+    so it stays a few board rows wide however large the board is, and
+    subset tests, differences and counts are single integer operations.
+    Supports the same methods as `Sentence`.
+    """
+
+    def __init__(self, cells, count, width):
+        self.width = width
+        self.count = count
+        indices = [i * width + j for i, j in cells]
+        self.base = min(indices, default=0)
+        self.mask = 0
+        for index in indices:
+            self.mask |= 1 << (index - self.base)
+
+    @classmethod
+    def from_mask(cls, mask, base, count, width):
+        sentence = cls((), count, width)
+        sentence.mask = mask
+        sentence.base = base
+        sentence.normalize()
+        return sentence
+
+    def normalize(self):
+        """
+        Shifts the mask so that its lowest bit is set.
+        """
+        if self.mask:
+            low = (self.mask & -self.mask).bit_length() - 1
+            self.mask >>= low
+            self.base += low
+        else:
+            self.base = 0
+
+    def align(self, other):
+        """
+        Returns both masks shifted to a common base, and that base.
+        """
+        base = min(self.base, other.base)
+        return (self.mask << (self.base - base),
+                other.mask << (other.base - base),
+                base)
+
+    @property
+    def cells(self):
+        return set(self)
+
+    def __iter__(self):
+        mask, base = self.mask, self.base
+        while mask:
+            low = mask & -mask
+            yield divmod(base + low.bit_length() - 1, self.width)
+            mask ^= low
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __eq__(self, other):
+        return (self.mask == other.mask and self.base == other.base
+                and self.count == other.count)
+
+    def __lt__(self, other):
+        # Other cells below the lowest cell of self cannot be in self, so
+        # only the rest of other is compared
+        if not self.mask:
+            return bool(other.mask)
+        shift = self.base - other.base
+        if shift < 0:
+            return False
+        return (self.mask & ~(other.mask >> shift) == 0
+                and len(self) < len(other))
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def difference(self, other):
+        """
+        Returns the sentence for the cells of self not in other.
+        """
+        a, b, base = self.align(other)
+        return BitSentence.from_mask(
+            a & ~b, base, self.count - other.count, self.width)
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.count == len(self):
+            return self.cells
+        return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        return set()
+
+    def discard(self, cell):
+        """
+        Removes `cell` from the sentence, returning True if it was present.
+        """
+        bit = cell[0] * self.width + cell[1] - self.base
+        if bit < 0 or not self.mask >> bit & 1:
+            return False
+        self.mask &= ~(1 << bit)
+        self.normalize()
+        return True
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        if self.discard(cell):
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        self.discard(cell)
+
+
+class GuessTimeout(Exception):
+    """
+    Raised when enumerating mine configurations exceeds its time budget.
+    """
+
+
+def solve_component(constraints, deadline=None):
+    """
+    Enumerates every assignment of mines to the cells of `constraints`,
+    a list of (cells, count) pairs forming one connected component,
+    that satisfies all of them.
+
+    Returns the ordered list of cells and a dictionary mapping each
+    possible number of mines `k` to a pair of the number of assignments
+    with `k` mines and, for each cell, how many of those make it a mine.
+    Raises GuessTimeout if `deadline` passes first.
+    """
+
+    # Order cells constraint by constraint so that constraints
+    # are completed early and dead ends are pruned quickly
+    cells = []
+    position = {}
+    for constraint_cells, _ in constraints:
+        for cell in sorted(constraint_cells):
+            if cell not in position:
+                position[cell] = len(cells)
+                cells.append(cell)
+    cell_constraints = [[] for _ in cells]
+    need = []
+    unassigned = []
+    for c, (constraint_cells, count) in enumerate(constraints):
+        for cell in constraint_cells:
+            cell_constraints[position[cell]].append(c)
+        need.append(count)
+        unassigned.append(len(constraint_cells))
+
+    n = len(cells)
+    solutions = {}
+    values = [-1] * n
+    mines = 0
+    nodes = 0
+    i = 0
+    while i >= 0:
+        if i == n:
+            ways, counts = solutions.get(mines, (0, [0] * n))
+            for j in range(n):
+                counts[j] += values[j]
+            solutions[mines] = (ways + 1, counts)
+            i -= 1
+            continue
+
+        nodes += 1
+        if deadline is not None and nodes % 1024 == 0:
+            if time.perf_counter() > deadline:
+                raise GuessTimeout
+
+        # Undo the current value of cell i, then try the next one
+        value = values[i]
+        if value >= 0:
+            for c in cell_constraints[i]:
+                need[c] += value
+                unassigned[c] += 1
+            mines -= value
+        value += 1
+        while value <= 1 and not all(
+            0 <= need[c] - value <= unassigned[c] - 1
+            for c in cell_constraints[i]
+        ):
+            value += 1
+        if value > 1:
+            values[i] = -1
+            i -= 1
+            continue
+
+        values[i] = value
+        for c in cell_constraints[i]:
+            need[c] -= value
+            unassigned[c] -= 1
+        mines += value
+        i += 1
+
+    return cells, solutions
+
+
+def log_comb(n, k):
+    """
+    Returns the natural logarithm of n choose k.
+    """
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+def convolve(a, b):
+    """
+    Returns the distribution of the sum of two independent counts,
+    each given as a dictionary mapping a count to its weight.
+    """
+    result = {}
+    for i, x in a.items():
+        for j, y in b.items():
+            result[i + j] = result.get(i + j, 0) + x * y
+    return result
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, guess="random",
+                 time_budget=TIME_BUDGET):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines, if known, and how to guess when stuck
+        if guess not in GUESSES:
+            raise ValueError(f"guess must be one of {GUESSES}")
+        if guess == "probable" and mines is None:
+            raise ValueError("probable guesses need the number of mines")
+        self.total_mines = mines
+        self.guess = guess
+        self.time_budget = time_budget
+
+        # Solutions of frontier components already enumerated
+        self.component_cache = {}
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -160,12 +545,24 @@ class MinesweeperAI():
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Safe cells in the order they were found, some of which
+        # may have been played since
+        self.pending_safes = collections.deque()
+
+        # Cells neither played nor known to be mines, with the
+        # position of each in the list for constant-time removal
+        self.unknown = [(i, j) for i in range(height) for j in range(width)]
+        self.unknown_index = {
+            cell: k for k, cell in enumerate(self.unknown)
+        }
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
+        self.remove_unknown(cell)
         for sentence in self.knowledge:
             sentence.mark_mine(cell)
 
@@ -174,10 +571,25 @@ class MinesweeperAI():
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell not in self.safes and cell not in self.moves_made:
+            self.pending_safes.append(cell)
         self.safes.add(cell)
         for sentence in self.knowledge:
             sentence.mark_safe(cell)
 
+    def remove_unknown(self, cell):
+        """
+        Removes a cell from the unknown cells, if it is still there,
+        by moving the last unknown cell into its place.
+        """
+        k = self.unknown_index.pop(cell, None)
+        if k is None:
+            return
+        last = self.unknown.pop()
+        if k < len(self.unknown):
+            self.unknown[k] = last
+            self.unknown_index[last] = k
+
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -194,16 +606,27 @@ class MinesweeperAI():
                if they can be inferred from existing knowledge
         """
         self.moves_made.add(cell) #1
-        self.safes.add(cell) #2
-        new_sentence = Sentence(self.nearby_mines(cell),count) #3
+        self.remove_unknown(cell)
+        self.mark_safe(cell) #2
+        neighbors = self.nearby_mines(cell)
+        new_sentence = self.sentence(neighbors,count) #3
+        for i in neighbors & self.mines:
+            new_sentence.mark_mine(i)
+        for i in neighbors & self.safes:
+            new_sentence.mark_safe(i)
 
-        length=len(new_sentence.cells)
         self.knowledge_append(new_sentence) #4
 
         self.inferred(new_sentence)      #5
 
         #raise NotImplementedError
 
+    def sentence(self, cells, count):
+        """
+        Returns a new sentence about `cells` for the knowledge base.
+        """
+        return Sentence(cells, count)
+
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -213,11 +636,12 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        move_space=set()
-        move_space=move_space.union(self.safes)
-        move_space=move_space.difference(self.moves_made)
-        if len(move_space)!=0:
-            return move_space.pop()
+        # Cells are queued when found safe, so only cells
+        # played since then need to be skipped
+        while self.pending_safes and self.pending_safes[0] in self.moves_made:
+            self.pending_safes.popleft()
+        if self.pending_safes:
+            return self.pending_safes[0]
         else:
             return None
         #raise NotImplementedError
@@ -229,18 +653,157 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        move_space=set()
-        for i in range(self.height):
-            for j in range(self.width):
-                move_space.add(tuple((i,j)))
-        move_space=move_space.difference(self.moves_made)
-        move_space=move_space.difference(self.mines)
-        if len(move_space)!=0:
-            return move_space.pop()
+        if self.guess == "probable":
+            return self.make_probable_move()
+        if len(self.unknown)!=0:
+            return random.choice(self.unknown)
         else:
             return None
         #raise NotImplementedError
 
+    def make_probable_move(self):
+        """
+        Returns the unrevealed cell least likely to be a mine.
+
+        Cells mentioned by the knowledge base (the frontier) are split
+        into independent components whose consistent mine assignments
+        are enumerated, and the components are combined with the number
+        of ways to place the remaining mines on the unconstrained cells.
+        Components that cannot be solved within `time_budget` seconds,
+        and all unconstrained cells, fall back to the global mine density.
+        """
+        deadline = time.perf_counter() + self.time_budget
+        remaining = self.total_mines - len(self.mines)
+        unknown = len(self.unknown)
+        if unknown == 0:
+            return None
+
+        # Known safes are never guessed, so only constraints on
+        # cells that are still unknown matter
+        constraints = {}
+        for sentence in self.knowledge:
+            cells = frozenset(
+                sentence.cells - self.mines - self.safes - self.moves_made)
+            count = sentence.count - len(sentence.cells & self.mines)
+            if cells:
+                constraints[cells] = count
+
+        solved = []
+        frontier = set()
+        for component in self.frontier_components(constraints):
+            key = frozenset(component)
+            if key not in self.component_cache:
+                try:
+                    self.component_cache[key] = solve_component(
+                        component, deadline)
+                except GuessTimeout:
+                    continue
+            cells, solutions = self.component_cache[key]
+            solved.append((cells, solutions))
+            frontier.update(cells)
+        # Every move made is marked safe, so the safes not yet played
+        # are counted without building their set
+        unconstrained = (unknown - len(frontier)
+                         - (len(self.safes) - len(self.moves_made)))
+
+        # Weight every total number of frontier mines by the number of
+        # ways to place the rest of the mines on unconstrained cells
+        def weight(m):
+            k = remaining - m
+            if not 0 <= k <= unconstrained:
+                return None
+            return log_comb(unconstrained, k)
+
+        # Scale every component so that its weights stay small floats
+        distributions = []
+        for _, solutions in solved:
+            top = max(ways for ways, _ in solutions.values())
+            distributions.append({
+                k: ways / top for k, (ways, _) in solutions.items()
+            })
+        prefix = [{0: 1.0}]
+        for distribution in distributions:
+            prefix.append(convolve(prefix[-1], distribution))
+        suffix = [{0: 1.0}]
+        for distribution in reversed(distributions):
+            suffix.append(convolve(suffix[-1], distribution))
+        suffix.reverse()
+
+        logs = {m: weight(m) for m in prefix[-1]}
+        top = max((x for x in logs.values() if x is not None), default=None)
+        if top is None:
+            weights = {m: 1.0 for m in logs}
+        else:
+            weights = {m: (math.exp(x - top) if x is not None else 0.0)
+                       for m, x in logs.items()}
+        total = sum(p * weights[m] for m, p in prefix[-1].items())
+
+        best = None
+        for c, (cells, solutions) in enumerate(solved):
+            others = convolve(prefix[c], suffix[c + 1])
+            top = total * max(ways for ways, _ in solutions.values())
+            probabilities = [0.0] * len(cells)
+            for k, (_, counts) in solutions.items():
+                scale = sum(p * weights[k + m] for m, p in others.items())
+                scale /= top
+                for i, count in enumerate(counts):
+                    probabilities[i] += count * scale
+            for cell, p in zip(cells, probabilities):
+                if best is None or p < best[0]:
+                    best = (p, cell)
+
+        if unconstrained > 0:
+            expected = sum(p * weights[m] * (remaining - m)
+                           for m, p in prefix[-1].items()) / total
+            density = expected / unconstrained
+            if best is None or density < best[0]:
+                cell = self.unconstrained_cell(frontier)
+                if cell is not None:
+                    best = (density, cell)
+
+        return best[1] if best is not None else None
+
+    def frontier_components(self, constraints):
+        """
+        Splits a mapping of constraint cells to mine counts into lists of
+        (cells, count) pairs that share no cells with other lists.
+        """
+        parent = {}
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for cells in constraints:
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            first = find(next(iter(cells)))
+            for cell in cells:
+                parent[find(cell)] = first
+
+        components = {}
+        for cells, count in constraints.items():
+            root = find(next(iter(cells)))
+            components.setdefault(root, []).append((cells, count))
+        return list(components.values())
+
+    def unconstrained_cell(self, frontier):
+        """
+        Returns a random unknown cell that no sentence mentions.
+        """
+        def free(cell):
+            return cell not in self.safes and cell not in frontier
+
+        # Sampling is quick unless most unknown cells are constrained
+        for _ in range(64):
+            cell = random.choice(self.unknown)
+            if free(cell):
+                return cell
+        cells = [cell for cell in self.unknown if free(cell)]
+        return random.choice(cells) if cells else None
+
     def nearby_mines(self, cell):
         """
         Returns a set of neighbors on the board.
@@ -262,27 +825,26 @@ class MinesweeperAI():
         return neighbors
 
     def permitted_values(self,x,variable):
+        """
+        Returns the coordinates within one step of `x` that lie on the
+        board, along rows if `variable` is 0 and along columns if it is 1.
+        """
         if variable == 0:
-            limit = self.width-1
-        elif variable == 1:
             limit = self.height-1
-        if x in range(1,limit):
-            return [x-1,x,x+1]
-        elif x==0:
-            return [x,x+1]
-        elif x==7:
-            return [x-1,x]
+        elif variable == 1:
+            limit = self.width-1
+        return range(max(x-1,0),min(x+1,limit)+1)
 
     def all_mine(self,sentence):
-        if len(sentence.cells)==sentence.count:
-            for i in sentence.cells:
+        if len(sentence)==sentence.count:
+            for i in list(sentence):
                 self.mark_mine(i)
             return True
         return False
 
     def no_mines(self,sentence):
         if sentence.count==0:
-            for i in sentence.cells:
+            for i in list(sentence):
                 self.mark_safe(i)
             return True
         return False
@@ -315,9 +877,43 @@ class MinesweeperAI():
                 self.inferred(new_sentence)
 
     def knowledge_known_mines(self):
-        for i in self.knowledge:
-            i.known_mines()
+        self.knowledge_conclusions()
 
     def knowledge_known_safes(self):
-        for i in self.knowledge:
-            i.known_safes()
+        self.knowledge_conclusions()
+
+    def knowledge_conclusions(self):
+        """
+        Marks every cell that some sentence proves to be a mine or safe,
+        repeating until no more conclusions can be drawn, and drops
+        sentences that no longer mention any cells.
+        """
+        changed = True
+        while changed:
+            changed = False
+            for sentence in self.knowledge:
+                for i in (sentence.known_mines() or set()).copy():
+                    self.mark_mine(i)
+                    changed = True
+                for i in (sentence.known_safes() or set()).copy():
+                    self.mark_safe(i)
+                    changed = True
+            self.knowledge = [i for i in self.knowledge if len(i)]
+
+
+class BitMinesweeperAI(MinesweeperAI):
+    """
+    Minesweeper game player whose knowledge base is made of
+    `BitSentence`s, so inference works on integer bitmasks
+    instead of sets of tuples.
+    """
+
+    def sentence(self, cells, count):
+        return BitSentence(cells, count, self.width)
+
+    def inferred(self, new_sentence):
+        for sentence in self.knowledge:
+            if new_sentence < sentence:
+                self.knowledge_append(sentence.difference(new_sentence))
+            elif sentence < new_sentence:
+                self.knowledge_append(new_sentence.difference(sentence))
@@ -0,0 +1,118 @@
+import argparse
+import csv
+import math
+import multiprocessing
+import random
+import time
+
+from benchmark import AIS, BOARDS, parse_config, play_game
+from minesweeper import GUESSES
+
+FIELDS = [
+    "game", "seed", "height", "width", "mines", "won",
+    "moves", "guesses", "peak_knowledge", "inference_time"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper AI games across a process pool."
+    )
+    parser.add_argument("output", help="CSV file for per-game results")
+    parser.add_argument("-n", "--games", type=int, default=10000)
+    parser.add_argument("-c", "--config", type=parse_config,
+                        default=(8, 8, 8), metavar="HxWxM",
+                        help="board configuration, e.g. 16x30x99")
+    parser.add_argument("-s", "--seed", type=int, default=0,
+                        help="seed of the first game")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--board", choices=BOARDS, default="list")
+    parser.add_argument("--ai", choices=AIS, default="set")
+    parser.add_argument("--guess", choices=GUESSES, default="random")
+    args = parser.parse_args()
+
+    height, width, mines = args.config
+    start = time.perf_counter()
+    summary = simulate(
+        args.output, args.games, height, width, mines,
+        seed=args.seed, processes=args.processes,
+        ai=args.ai, guess=args.guess, board=args.board
+    )
+    elapsed = time.perf_counter() - start
+
+    if summary["games"] == 0:
+        print(f"Games: 0 in {elapsed:.1f}s")
+        return
+    print(f"Games: {summary['games']} in {elapsed:.1f}s "
+          f"({summary['games'] / elapsed:.0f} games/sec)")
+    low, high = wilson_interval(summary["wins"], summary["games"])
+    print(f"Win rate: {summary['wins'] / summary['games']:.4f} "
+          f"(95% CI {low:.4f}-{high:.4f})")
+    print(f"Mean moves: {summary['moves'] / summary['games']:.1f}")
+    print(f"Mean inference time: "
+          f"{summary['inference_time'] / summary['games'] * 1000:.2f}ms")
+
+
+def play_seeded(task):
+    """
+    Play the game described by `task` with the global RNG seeded
+    from it, so every game can be replayed on its own.
+    """
+    game_number, seed, height, width, mines, ai, guess, board = task
+    random.seed(seed)
+    game = BOARDS[board](height=height, width=width, mines=mines)
+    player = AIS[ai](height=height, width=width, mines=mines, guess=guess)
+    result = play_game(game, player)
+    result.update({
+        "game": game_number,
+        "seed": seed,
+        "height": height,
+        "width": width,
+        "mines": mines
+    })
+    return result
+
+
+def simulate(output, games, height, width, mines, seed=0, processes=None,
+             ai="set", guess="random", board="list"):
+    """
+    Play `games` games across a pool of `processes` workers, writing one
+    CSV row per game to `output` as results arrive. Game `k` is seeded
+    with `seed + k`. Return totals over all games.
+    """
+    tasks = (
+        (k, seed + k, height, width, mines, ai, guess, board)
+        for k in range(games)
+    )
+    summary = {"games": 0, "wins": 0, "moves": 0, "inference_time": 0.0}
+    with open(output, "w", newline="") as f, \
+            multiprocessing.Pool(processes) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for result in pool.imap_unordered(play_seeded, tasks, chunksize=64):
+            writer.writerow({field: result[field] for field in FIELDS})
+            summary["games"] += 1
+            summary["wins"] += result["won"]
+            summary["moves"] += result["moves"]
+            summary["inference_time"] += result["inference_time"]
+    return summary
+
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    Return the Wilson score interval for a win rate.
+    """
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denominator = 1 + z ** 2 / games
+    center = (p + z ** 2 / (2 * games)) / denominator
+    spread = z * math.sqrt(
+        p * (1 - p) / games + z ** 2 / (4 * games ** 2)
+    ) / denominator
+    return center - spread, center + spread
+
+
+if __name__ == "__main__":
+    main()
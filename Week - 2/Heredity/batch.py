@@ -0,0 +1,173 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+
+import bayesnet
+from heredity import PROBS, load_data
+
+COLUMNS = ["family", "person", "gene_0", "gene_1", "gene_2", "trait"]
+
+# Families gathered into one batch of output rows
+BATCH_SIZE = 1024
+
+# Pedigree structures compiled in this process, by shape
+pedigrees = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute Heredity marginals for many families."
+    )
+    parser.add_argument("families",
+                        help="directory of family CSVs, or a manifest file "
+                             "listing one CSV path per line")
+    parser.add_argument("output",
+                        help="output file, written as Parquet if it ends "
+                             "in .parquet and as CSV otherwise")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        summary = run_batch(family_paths(args.families), args.output,
+                            args.processes)
+    except RuntimeError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+
+    print(f"Families: {summary['families']} in {elapsed:.1f}s "
+          f"({summary['families'] / elapsed:.0f} families/sec)")
+    print(f"People: {summary['people']}")
+    print(f"Shapes compiled: {summary['compiled']} "
+          f"({summary['families'] - summary['compiled']} reused)")
+
+
+def family_paths(source):
+    """
+    Return the paths of the family CSVs in directory `source`, or listed
+    one per line in the manifest file `source`. Relative paths in a
+    manifest are relative to the manifest.
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, filename)
+            for filename in sorted(os.listdir(source))
+            if filename.endswith(".csv")
+        ]
+    base = os.path.dirname(source)
+    with open(source) as f:
+        return [os.path.join(base, line.strip()) for line in f
+                if line.strip() and not line.startswith("#")]
+
+
+def infer_family(path):
+    """
+    Return the marginals of the family in the CSV at `path` as output
+    rows, and whether its pedigree structure had to be compiled.
+    """
+    people = load_data(path)
+    names, shape = bayesnet.family_shape(people)
+    compiled = shape not in pedigrees
+    if compiled:
+        pedigrees[shape] = bayesnet.Pedigree(shape)
+    genes, trait = pedigrees[shape].marginals(
+        PROBS, [people[name]["trait"] for name in names])
+    rows = [
+        (path, name, float(genes[i, 0]), float(genes[i, 1]),
+         float(genes[i, 2]), float(trait[i]))
+        for i, name in enumerate(names)
+    ]
+    return rows, compiled
+
+
+def run_batch(paths, output, processes=None):
+    """
+    Compute the marginals of every family in `paths` across a pool of
+    `processes` workers and write them to `output`, one row per person.
+    Each worker compiles the structure of each pedigree shape once and
+    reuses it for every family of that shape. Return totals.
+    """
+    summary = {"families": 0, "people": 0, "compiled": 0}
+    with open_writer(output) as writer, \
+            multiprocessing.Pool(processes) as pool:
+        batch = []
+        for rows, compiled in pool.imap_unordered(infer_family, paths,
+                                                  chunksize=16):
+            batch.extend(rows)
+            summary["families"] += 1
+            summary["people"] += len(rows)
+            summary["compiled"] += compiled
+            if summary["families"] % BATCH_SIZE == 0:
+                writer.write(batch)
+                batch = []
+        writer.write(batch)
+    return summary
+
+
+def open_writer(output):
+    if output.endswith(".parquet"):
+        return ParquetWriter(output)
+    return CSVWriter(output)
+
+
+class CSVWriter():
+    """
+    Writes batches of output rows to a CSV file.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
+class ParquetWriter():
+    """
+    Writes batches of output rows to a Parquet file, one row group per
+    batch. Requires pyarrow.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow; "
+                               "write to a .csv file instead")
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [(column, pyarrow.string()) for column in COLUMNS[:2]] +
+            [(column, pyarrow.float64()) for column in COLUMNS[2:]]
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pyarrow.table(
+            {column: list(values) for column, values in zip(COLUMNS, columns)},
+            schema=self.schema
+        ))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import heapq
+
+import numpy as np
+
+
+class Pedigree():
+    """
+    Compiled structure of a pedigree as a Bayesian network over the
+    number of copies of the gene each person has.
+
+    Person `i` has parents `parents[i]`, a (mother, father) pair of
+    person indices (either may be None), or None for a founder. Every
+    person has one factor: the gene distribution of a founder, or the
+    inheritance table of a child given its parents, times the likelihood
+    of the person's trait if it is known. Unknown traits sum to one and
+    drop out of the network.
+
+    Compiling chooses an elimination order and builds the clique tree it
+    induces. Both depend only on the shape of the pedigree, so one
+    structure serves every family of that shape, whatever the traits.
+    """
+
+    def __init__(self, parents):
+        self.parents = [tuple(p) if p is not None else None for p in parents]
+        n = len(self.parents)
+        self.scopes = [
+            (i,) if p is None
+            else tuple(parent for parent in p if parent is not None) + (i,)
+            for i, p in enumerate(self.parents)
+        ]
+        self.order = elimination_order(self.scopes, n)
+        position = {v: k for k, v in enumerate(self.order)}
+
+        # Clique k eliminates person order[k]. Each factor belongs to the
+        # clique of the first of its people to be eliminated
+        self.assigned = [[] for _ in range(n)]
+        for i, scope in enumerate(self.scopes):
+            self.assigned[min(position[v] for v in scope)].append(i)
+
+        # Clique k sends a message over its separator to the clique of
+        # the first person in it to be eliminated
+        self.children = [[] for _ in range(n)]
+        self.separators = [None] * n
+        self.up = [None] * n
+        for k, v in enumerate(self.order):
+            clique = set()
+            for i in self.assigned[k]:
+                clique.update(self.scopes[i])
+            for c in self.children[k]:
+                clique.update(self.separators[c])
+            clique.discard(v)
+            self.separators[k] = tuple(sorted(clique, key=position.get))
+            if self.separators[k]:
+                self.up[k] = position[self.separators[k][0]]
+                self.children[self.up[k]].append(k)
+
+    def __len__(self):
+        return len(self.parents)
+
+    def tables(self, probs, traits):
+        """
+        Return the factor of every person, given the model `probs` and
+        each person's known trait (True, False or None).
+        """
+        prior, inherit, trait = probability_tables(probs)
+        tables = []
+        for i, p in enumerate(self.parents):
+            if p is None:
+                table = prior.copy()
+            else:
+                # A missing parent is taken to have no copies of the gene
+                table = inherit[tuple(
+                    slice(None) if parent is not None else 0 for parent in p
+                )]
+            if traits[i] is not None:
+                table = table * trait[:, int(traits[i])]
+            tables.append(table)
+        return tables
+
+    def marginals(self, probs, traits):
+        """
+        Return the distribution of every person's gene count, as an
+        (n, 3) array, and every person's probability of having the
+        trait, given the model `probs` and each person's known trait.
+
+        Messages are passed up the clique tree and back down, so every
+        marginal is found in two passes, in time linear in the size of
+        the pedigree when its cliques stay small.
+        """
+        tables = self.tables(probs, traits)
+        n = len(self)
+        factors = [
+            [(tables[i], self.scopes[i]) for i in self.assigned[k]]
+            for k in range(n)
+        ]
+
+        up = [None] * n
+        for k in range(n):
+            incoming = [(up[c], self.separators[c]) for c in self.children[k]]
+            up[k] = contract(factors[k] + incoming, self.separators[k])
+
+        down = [None] * n
+        genes = np.empty((n, 3))
+        for k in reversed(range(n)):
+            local = factors[k]
+            if self.up[k] is not None:
+                local = local + [(down[k], self.separators[k])]
+            incoming = [(up[c], self.separators[c]) for c in self.children[k]]
+            genes[self.order[k]] = contract(local + incoming,
+                                            (self.order[k],))
+            for j, c in enumerate(self.children[k]):
+                others = incoming[:j] + incoming[j + 1:]
+                down[c] = contract(local + others, self.separators[c])
+
+        trait = genes @ probability_tables(probs)[2][:, 1]
+        for i, known in enumerate(traits):
+            if known is not None:
+                trait[i] = float(known)
+        return genes, trait
+
+
+def probability_tables(probs):
+    """
+    Return the gene distribution of a founder, the table of a child's
+    gene count given its mother's and father's, indexed
+    [mother, father, child], and the table of trait given gene count,
+    indexed [gene, trait], from the model `probs`.
+    """
+    prior = np.array([probs["gene"][g] for g in range(3)])
+    trait = np.array([
+        [probs["trait"][g][False], probs["trait"][g][True]] for g in range(3)
+    ])
+
+    # Probability that a parent with 0, 1 or 2 copies passes the gene on
+    mutation = probs["mutation"]
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    mother, father = passes[:, None], passes[None, :]
+    inherit = np.stack([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father
+    ], axis=-1)
+    return prior, inherit, trait
+
+
+def elimination_order(scopes, n):
+    """
+    Return an order in which to eliminate the `n` variables of factors
+    with the given `scopes`, always eliminating a variable with the
+    fewest neighbors left in the moral graph.
+    """
+    neighbors = [set() for _ in range(n)]
+    for scope in scopes:
+        for v in scope:
+            neighbors[v].update(scope)
+    for v in range(n):
+        neighbors[v].discard(v)
+
+    heap = [(len(neighbors[v]), v) for v in range(n)]
+    heapq.heapify(heap)
+    eliminated = [False] * n
+    order = []
+    while heap:
+        degree, v = heapq.heappop(heap)
+        if eliminated[v] or degree != len(neighbors[v]):
+            continue
+        eliminated[v] = True
+        order.append(v)
+
+        # Eliminating v connects all of its neighbors to each other
+        for u in neighbors[v]:
+            neighbors[u].discard(v)
+            neighbors[u].update(neighbors[v] - {u})
+            heapq.heappush(heap, (len(neighbors[u]), u))
+    return order
+
+
+def contract(factors, scope):
+    """
+    Return the product of `factors`, a list of (table, variables) pairs,
+    summed down to the variables in `scope` and scaled to sum to 1.
+    """
+    labels = {}
+    operands = []
+    for table, variables in factors:
+        operands.append(table)
+        operands.append([labels.setdefault(v, len(labels)) for v in variables])
+
+    # A variable that no factor mentions is spread evenly
+    for v in scope:
+        if v not in labels:
+            operands.append(np.ones(3))
+            operands.append([labels.setdefault(v, len(labels))])
+    operands.append([labels[v] for v in scope])
+    result = np.einsum(*operands)
+    return result / result.sum()
+
+
+def family_shape(people):
+    """
+    Return the names of `people`, a dictionary as returned by
+    `heredity.load_data`, and the parents of each as a tuple of
+    (mother, father) index pairs, or None for founders.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    parents = tuple(
+        None if people[name]["mother"] is None
+        else (index[people[name]["mother"]],
+              index.get(people[name]["father"]))
+        for name in names
+    )
+    return names, parents
+
+
+def infer(people, probs, pedigree=None):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    in the same form as `heredity.main` computes by enumeration. A
+    `pedigree` already compiled for the shape of `people` is reused.
+    """
+    names, parents = family_shape(people)
+    if pedigree is None:
+        pedigree = Pedigree(parents)
+    traits = [people[name]["trait"] for name in names]
+    genes, trait = pedigree.marginals(probs, traits)
+    return {
+        name: {
+            "gene": {g: float(genes[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(trait[i]), False: float(1 - trait[i])}
+        }
+        for i, name in enumerate(names)
+    }
@@ -1,6 +1,8 @@
+import argparse
 import csv
 import itertools
-import sys
+import time
+import tracemalloc
 
 PROBS = {
 
@@ -36,13 +38,110 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Factors of joint probabilities by gene count, parents' gene counts,
+# trait and the values of PROBS they use, and how often a factor was
+# found there or computed
+factor_cache = {}
+cache_stats = {"hits": 0, "misses": 0}
+
+# Ways of computing the probabilities
+METHODS = ["enumerate", "vectorized", "elimination", "weighting", "gibbs"]
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv [--method METHOD] [--stats] "
+              "[--samples N] [--chains N] [--seed SEED]"
+    )
+    parser.add_argument("data")
+    parser.add_argument("--method", choices=METHODS, default="enumerate",
+                        help="enumerate every joint assignment, in Python "
+                             "or with NumPy, run variable elimination on "
+                             "the pedigree, or estimate by likelihood "
+                             "weighting or blocked Gibbs sampling")
+    parser.add_argument("--stats", action="store_true",
+                        help="report assignments evaluated, time and peak "
+                             "memory")
+    parser.add_argument("--samples", type=int, default=100000,
+                        help="sample budget of the sampling methods")
+    parser.add_argument("--chains", type=int, default=4,
+                        help="independent chains, run across processes")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    stats = {}
+    errors = None
+    if args.stats:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if args.method == "elimination":
+        import bayesnet
+        probabilities = bayesnet.infer(people, PROBS)
+    elif args.method == "vectorized":
+        import vectorized
+        probabilities = vectorized.infer(people, PROBS)
+    elif args.method in ["weighting", "gibbs"]:
+        import sampling
+        probabilities, errors, diagnostics = sampling.infer(
+            people, PROBS, args.method, samples=args.samples,
+            chains=args.chains, seed=args.seed
+        )
+        stats.update(diagnostics)
+    else:
+        probabilities = enumerate_probabilities(people, stats)
+    elapsed = time.perf_counter() - start
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    error = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {error:.4f}")
+
+    # Report how far sampled estimates can be trusted
+    if "ess" in stats:
+        print(f"Effective sample size: {stats['ess']:.0f}")
+    if "rhat" in stats:
+        print(f"Largest R-hat: {stats['rhat']:.3f} "
+              f"({stats['sweeps']} sweeps per chain, "
+              f"{stats['burn_in']} discarded)")
+
+    if args.stats:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if "assignments" in stats:
+            print(f"Assignments evaluated: {stats['assignments']}")
+            lookups = stats["hits"] + stats["misses"]
+            print(f"Factor cache: {stats['hits']} hits, "
+                  f"{stats['misses']} misses "
+                  f"({stats['hits'] / max(lookups, 1):.2%} hit rate)")
+        print(f"Time: {elapsed:.3f}s")
+        print(f"Peak memory: {peak / 1024:.1f} KiB")
+
+
+def enumerate_probabilities(people, stats=None):
+    """
+    Return the gene and trait distribution of every person in `people`
+    by summing the joint probability of every assignment of genes and
+    traits consistent with the known traits.
+
+    Known traits are fixed rather than enumerated and filtered, and
+    assignments are generated lazily as tuples of gene counts and
+    traits, one entry per person. If `stats` is a dictionary, the
+    number of assignments evaluated is stored in it.
+    """
+    names = list(people)
+    family = parent_indices(people, names)
+    clear_cache()
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -60,38 +159,51 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
+    assignments = 0
+    for traits in trait_assignments(people, names):
+        for genes in itertools.product(range(3), repeat=len(names)):
+            p = joint_probability_vector(family, genes, traits)
+            for i, person in enumerate(names):
+                probabilities[person]["gene"][genes[i]] += p
+                probabilities[person]["trait"][traits[i]] += p
+            assignments += 1
+    if stats is not None:
+        stats["assignments"] = assignments
+        stats.update(cache_stats)
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+def parent_indices(people, names):
+    """
+    Return, for each person in `names`, the positions of their mother
+    and father in `names`, or None if they have no parents listed. A
+    missing father has position None.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    return [
+        None if people[name]["mother"] is None
+        else (index[people[name]["mother"]],
+              index.get(people[name]["father"]))
+        for name in names
+    ]
 
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+def trait_assignments(people, names):
+    """
+    Yield every assignment of traits to `names` that agrees with the
+    known traits in `people`, as a tuple of booleans. Only people whose
+    trait is unknown vary.
+    """
+    unknown = [i for i, name in enumerate(names)
+               if people[name]["trait"] is None]
+    traits = [people[name]["trait"] for name in names]
+    for values in itertools.product((False, True), repeat=len(unknown)):
+        for i, value in zip(unknown, values):
+            traits[i] = value
+        yield tuple(traits)
 
 
 def load_data(filename):
@@ -118,14 +230,13 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Yield all possible subsets of set s.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -139,21 +250,77 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-    #print("one_gene ",one_gene)
-    #print("two_genes ",two_genes)
-    #print("have_trait ",have_trait)
     jp = 1.0
     for p in people:
-        pg = gene(p,people,one_gene,two_genes)#probability has gene
-        #print("pg ",pg)
-        t = trait(p,people,one_gene,two_genes,have_trait)#probability has trait given gene situation
-        #print("t ",t)
-        
-        jp *= float(pg*t) 
-        #print("jp", jp)
-    #print (jp)
+        count = 1 if p in one_gene else 2 if p in two_genes else 0
+        parent_counts = None
+        if people[p]["mother"] is not None:
+            parent = parents(people, p, one_gene, two_genes)
+            parent_counts = (parent["mother"], parent["father"])
+        jp *= person_factor(count, parent_counts, p in have_trait)
     return jp
-    #raise NotImplementedError
+
+
+def joint_probability_vector(family, genes, traits):
+    """
+    Compute and return the same joint probability as `joint_probability`
+    for an assignment given as tuples of each person's gene count and
+    trait, where `family` holds each person's parent positions as
+    returned by `parent_indices`.
+    """
+    jp = 1.0
+    for i, parent in enumerate(family):
+        parent_counts = None
+        if parent is not None:
+            mother, father = parent
+            parent_counts = (genes[mother],
+                             genes[father] if father is not None else 0)
+        jp *= person_factor(genes[i], parent_counts, traits[i])
+    return jp
+
+
+def person_factor(count, parent_counts, has_trait):
+    """
+    Return one person's factor of a joint probability: the probability
+    of their gene `count`, given their parents' gene counts (or None if
+    they have no parents listed), times the probability of `has_trait`
+    given `count`.
+
+    There are at most 60 distinct factors for one model, so factors are
+    cached and looked up again rather than recomputed. The key includes
+    the values of PROBS the factor uses, so changing PROBS never returns
+    a stale factor.
+    """
+    if parent_counts is None:
+        model = PROBS["gene"][count]
+    else:
+        model = PROBS["mutation"]
+    key = (count, parent_counts, has_trait, model,
+           PROBS["trait"][count][has_trait])
+    factor = factor_cache.get(key)
+    if factor is not None:
+        cache_stats["hits"] += 1
+        return factor
+    cache_stats["misses"] += 1
+
+    if parent_counts is None:
+        pg = model
+    else:
+        pg = gene_conditions({
+            "mother": parent_counts[0],
+            "father": parent_counts[1]
+        }, count)
+    factor = float(pg * PROBS["trait"][count][has_trait])
+    factor_cache[key] = factor
+    return factor
+
+
+def clear_cache():
+    """
+    Empty the factor cache and reset its counters.
+    """
+    factor_cache.clear()
+    cache_stats["hits"] = cache_stats["misses"] = 0
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -202,36 +369,6 @@ def normalize(probabilities):
     #raise NotImplementedError
 
 
-def gene(p,people,one_gene,two_genes):
-    if people[p]["mother"] == None:
-        if p in one_gene:
-            return PROBS["gene"][1]
-        elif p in two_genes:
-            return PROBS["gene"][2]
-        else:
-            return PROBS["gene"][0]
-    else:
-        if p in one_gene:
-            return gene_conditions(parents(people, p, one_gene, two_genes),1)
-        elif p in two_genes:
-            return gene_conditions(parents(people, p, one_gene, two_genes),2)
-        else:
-            return gene_conditions(parents(people, p, one_gene, two_genes),0)
-
-def trait(p,people,one_gene,two_genes,have_trait):
-    k=None
-    if p in one_gene:
-        k=1
-    elif p in two_genes:
-        k=2
-    else:
-        k=0
-
-    if p in have_trait:
-        return PROBS["trait"][k][True]
-    else:
-        return PROBS["trait"][k][False]
-
 def gene_conditions(parent, condition):
     pm1 = prob_parent(1,parent["mother"])
     pm0 = 1-pm1
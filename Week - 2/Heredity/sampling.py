@@ -0,0 +1,361 @@
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from bayesnet import family_shape, probability_tables
+
+SAMPLES = 100000
+CHAINS = 4
+
+# Fraction of each Gibbs chain discarded before estimates are taken
+BURN_IN = 0.1
+
+# Batches each Gibbs chain is split into to estimate standard errors
+BATCHES = 20
+
+# Likelihood weighting samples drawn at a time
+BLOCK_SIZE = 4096
+
+
+class Family():
+    """
+    A pedigree and the model `probs`, prepared for sampling.
+
+    Gene counts of a set of samples or chains are kept in an array with
+    one row per sample and one column per person, plus a final column of
+    zeros that stands in for a missing parent.
+    """
+
+    def __init__(self, people, probs):
+        self.names, self.parents = family_shape(people)
+        n = len(self.names)
+        prior, inherit, trait = probability_tables(probs)
+        self.prior, self.inherit, self.trait = prior, inherit, trait
+        self.log_prior = np.log(prior)
+        self.log_inherit = np.log(inherit)
+        self.log_trait = np.log(trait)
+        self.evidence = [people[name]["trait"] for name in self.names]
+
+        # Parent columns, with column n for missing parents
+        self.mothers = [n if p is None else p[0] for p in self.parents]
+        self.fathers = [n if p is None or p[1] is None else p[1]
+                        for p in self.parents]
+        self.children = [[] for _ in range(n)]
+        for i, p in enumerate(self.parents):
+            for parent in set(p or ()) - {None}:
+                self.children[parent].append(i)
+        self.order = topological_order(self.parents)
+        self.blocks = [self.block(members) for members in self.mating_pairs()]
+
+    def __len__(self):
+        return len(self.names)
+
+    def mating_pairs(self):
+        """
+        Return a partition of the people into blocks sampled together:
+        the parents of each child, unless either is already in a block,
+        and everyone left over on their own.
+        """
+        blocked = set()
+        blocks = []
+        for p in self.parents:
+            if p is None or None in p or p[0] == p[1]:
+                continue
+            if not blocked.intersection(p):
+                blocked.update(p)
+                blocks.append(tuple(p))
+        blocks.extend((i,) for i in range(len(self)) if i not in blocked)
+        return blocks
+
+    def block(self, members):
+        """
+        Return the members of a block, every joint state of their gene
+        counts, and the (person, mother, father, trait) factors that
+        involve them: their own and their children's.
+        """
+        states = np.array(list(itertools.product(range(3),
+                                                 repeat=len(members))))
+        touched = sorted(set(members).union(
+            *(self.children[m] for m in members)))
+        factors = [
+            (j, None if self.parents[j] is None else self.mothers[j],
+             self.fathers[j], self.evidence[j])
+            for j in touched
+        ]
+        return members, states, factors
+
+    def estimands(self, genes):
+        """
+        Return, for every sample in `genes`, an (n, 4) array: indicators
+        of each person having 0, 1 or 2 copies of the gene, then their
+        probability of having the trait given their gene count.
+        """
+        n = len(self)
+        genes = genes[..., :n]
+        values = np.zeros(genes.shape + (4,))
+        np.put_along_axis(values, genes[..., None], 1.0, axis=-1)
+        values[..., 3] = self.trait[genes, 1]
+        for i, known in enumerate(self.evidence):
+            if known is not None:
+                values[..., i, 3] = float(known)
+        return values
+
+
+def topological_order(parents):
+    """
+    Return the people in an order where parents come before children.
+    """
+    order = []
+    placed = set()
+
+    def place(i):
+        stack = [i]
+        while stack:
+            j = stack[-1]
+            waiting = [p for p in (parents[j] or ()) if p is not None
+                       and p not in placed]
+            if waiting:
+                stack.extend(waiting)
+                continue
+            stack.pop()
+            if j not in placed:
+                placed.add(j)
+                order.append(j)
+
+    for i in range(len(parents)):
+        place(i)
+    return order
+
+
+def choose(rng, probabilities):
+    """
+    Return one index sampled from each row of `probabilities`, which
+    need not be normalized.
+    """
+    cumulative = np.cumsum(probabilities, axis=-1)
+    u = rng.random(cumulative.shape[:-1] + (1,)) * cumulative[..., -1:]
+    return np.minimum((u > cumulative).sum(axis=-1),
+                      probabilities.shape[-1] - 1)
+
+
+def forward_sample(family, rng, count):
+    """
+    Return `count` samples of everyone's gene count drawn from the
+    model, ignoring the evidence, and the log likelihood of the known
+    traits under each.
+    """
+    n = len(family)
+    genes = np.zeros((count, n + 1), dtype=np.int64)
+    log_weights = np.zeros(count)
+    for i in family.order:
+        if family.parents[i] is None:
+            probabilities = np.broadcast_to(family.prior, (count, 3))
+        else:
+            probabilities = family.inherit[genes[:, family.mothers[i]],
+                                           genes[:, family.fathers[i]]]
+        genes[:, i] = choose(rng, probabilities)
+        if family.evidence[i] is not None:
+            log_weights += family.log_trait[genes[:, i],
+                                            int(family.evidence[i])]
+    return genes, log_weights
+
+
+def weighting_run(task):
+    """
+    Draw `samples` likelihood-weighted samples and return the weighted
+    sums needed for the estimates and their standard errors, scaled by
+    exp(-shift) to stay in range, and the shift.
+    """
+    family, samples, seed = task
+    rng = np.random.default_rng(seed)
+    n = len(family)
+    sums = {"shift": -np.inf, "w": 0.0, "w2": 0.0,
+            "wx": np.zeros((n, 4)), "w2x": np.zeros((n, 4)),
+            "w2x2": np.zeros((n, 4))}
+    for start in range(0, samples, BLOCK_SIZE):
+        genes, log_weights = forward_sample(
+            family, rng, min(BLOCK_SIZE, samples - start))
+        shift = max(sums["shift"], log_weights.max())
+        rescale = np.exp(sums["shift"] - shift)
+        for key in ["w", "wx"]:
+            sums[key] = sums[key] * rescale
+        for key in ["w2", "w2x", "w2x2"]:
+            sums[key] = sums[key] * rescale ** 2
+        sums["shift"] = shift
+
+        w = np.exp(log_weights - shift)
+        x = family.estimands(genes)
+        sums["w"] += w.sum()
+        sums["w2"] += (w ** 2).sum()
+        sums["wx"] += np.einsum("s,sij->ij", w, x)
+        sums["w2x"] += np.einsum("s,sij->ij", w ** 2, x)
+        sums["w2x2"] += np.einsum("s,sij->ij", w ** 2, x ** 2)
+    return sums
+
+
+def gibbs_run(task):
+    """
+    Run a group of Gibbs chains in lockstep for `sweeps` sweeps over the
+    blocks of `family` and return, for every chain, the sums of the
+    estimands over each of `BATCHES` consecutive batches of the sweeps
+    after `burn_in`, and their sums of squares over all those sweeps.
+    """
+    family, chains, sweeps, burn_in, seed = task
+    rng = np.random.default_rng(seed)
+    genes, _ = forward_sample(family, rng, chains)
+    rows = np.arange(chains)[:, None]
+    sums = np.zeros((chains, BATCHES, len(family), 4))
+    squares = np.zeros((chains, len(family), 4))
+    kept = sweeps - burn_in
+
+    for sweep in range(sweeps):
+        for members, states, factors in family.blocks:
+            position = {m: k for k, m in enumerate(members)}
+
+            def values(v):
+                if v in position:
+                    return states[:, position[v]][None, :]
+                return genes[:, v][:, None]
+
+            # Log probability of every joint state of the block, given
+            # everyone else, from the factors that involve the block
+            log_p = np.zeros((chains, len(states)))
+            for j, mother, father, trait in factors:
+                if mother is None:
+                    log_p += family.log_prior[values(j)]
+                else:
+                    log_p += family.log_inherit[values(mother),
+                                                values(father), values(j)]
+                if trait is not None:
+                    log_p += family.log_trait[values(j), int(trait)]
+            p = np.exp(log_p - log_p.max(axis=1, keepdims=True))
+            genes[rows, np.array(members)] = states[choose(rng, p)]
+
+        if sweep >= burn_in:
+            x = family.estimands(genes)
+            sums[:, (sweep - burn_in) * BATCHES // kept] += x
+            squares += x ** 2
+    return sums, squares
+
+
+def likelihood_weighting(family, samples, chains, pool, seeds):
+    """
+    Return estimates, standard errors and the effective sample size
+    from likelihood weighting, with the samples split over `chains`
+    independent runs.
+    """
+    counts = [len(c) for c in np.array_split(np.arange(samples), chains)]
+    runs = pool([(family, count, seed) for count, seed in zip(counts, seeds)],
+                weighting_run)
+
+    # Bring every run's sums to a common scale before adding them
+    shift = max(run["shift"] for run in runs)
+    total = {}
+    for run in runs:
+        rescale = np.exp(run["shift"] - shift)
+        for key in ["w", "wx"]:
+            total[key] = total.get(key, 0) + run[key] * rescale
+        for key in ["w2", "w2x", "w2x2"]:
+            total[key] = total.get(key, 0) + run[key] * rescale ** 2
+
+    estimates = total["wx"] / total["w"]
+
+    # Delta-method variance of a ratio estimator
+    variance = (total["w2x2"] - 2 * estimates * total["w2x"]
+                + estimates ** 2 * total["w2"]) / total["w"] ** 2
+    errors = np.sqrt(np.maximum(variance, 0))
+    diagnostics = {"ess": total["w"] ** 2 / total["w2"]}
+    return estimates, errors, diagnostics
+
+
+def gibbs(family, samples, chains, pool, seeds, burn_in=BURN_IN):
+    """
+    Return estimates, standard errors by batch means, and the largest
+    potential scale reduction factor (R-hat) of any estimate, from
+    blocked Gibbs sampling with `chains` chains sharing `samples`
+    sweeps.
+    """
+    sweeps = max(2 * BATCHES, samples // chains)
+    discard = int(sweeps * burn_in)
+    kept = sweeps - discard
+    groups = [len(g) for g in np.array_split(np.arange(chains), len(seeds))]
+    runs = pool([(family, group, sweeps, discard, seed)
+                 for group, seed in zip(groups, seeds) if group], gibbs_run)
+    batch_sums = np.concatenate([run[0] for run in runs])
+    squares = np.concatenate([run[1] for run in runs])
+
+    # Batches long compared to the chains' autocorrelation have nearly
+    # independent means, whose spread gives the standard error
+    sizes = np.bincount(np.arange(kept) * BATCHES // kept, minlength=BATCHES)
+    batch_means = (batch_sums / sizes[:, None, None]).reshape(
+        (-1,) + batch_sums.shape[2:])
+    errors = batch_means.std(axis=0, ddof=1) / np.sqrt(len(batch_means))
+
+    means = batch_sums.sum(axis=1) / kept
+    estimates = means.mean(axis=0)
+
+    # Gelman-Rubin: compare the variance within chains to between them
+    within = ((squares - kept * means ** 2) / max(kept - 1, 1)).mean(axis=0)
+    between = kept * means.var(axis=0, ddof=1) if chains > 1 else 0
+    pooled = (kept - 1) / kept * within + between / kept
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rhat = np.where(within > 0, np.sqrt(pooled / within), 1.0)
+    diagnostics = {"rhat": float(np.nanmax(rhat)), "sweeps": sweeps,
+                   "burn_in": discard}
+    return estimates, errors, diagnostics
+
+
+METHODS = {
+    "weighting": likelihood_weighting,
+    "gibbs": gibbs
+}
+
+
+def infer(people, probs, method="gibbs", samples=SAMPLES, chains=CHAINS,
+          processes=None, seed=None):
+    """
+    Return estimates of the gene and trait distribution of every person
+    in `people`, in the same form as `heredity.main` computes exactly,
+    their standard errors in the same form, and convergence diagnostics.
+
+    The `samples` budget is split across `chains` independent chains of
+    likelihood weighting or blocked Gibbs sampling, run across a pool of
+    `processes` workers.
+    """
+    family = Family(people, probs)
+    processes = min(chains, processes or multiprocessing.cpu_count())
+    seeds = np.random.SeedSequence(seed).spawn(
+        chains if method == "weighting" else processes)
+
+    def pool(tasks, run):
+        if processes == 1:
+            return list(map(run, tasks))
+        with multiprocessing.Pool(processes) as workers:
+            return workers.map(run, tasks)
+
+    estimates, errors, diagnostics = METHODS[method](
+        family, samples, chains, pool, seeds)
+
+    # Known traits are exact, whatever rounding the averaging left
+    for i, known in enumerate(family.evidence):
+        if known is not None:
+            estimates[i, 3], errors[i, 3] = float(known), 0.0
+    return (distributions(family.names, estimates),
+            distributions(family.names, errors, errors=True), diagnostics)
+
+
+def distributions(names, values, errors=False):
+    """
+    Return `values`, an (n, 4) array of gene and trait estimates, or of
+    their standard `errors`, in the dictionary form of `heredity.main`.
+    """
+    return {
+        name: {
+            "gene": {g: float(values[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(values[i, 3]),
+                      False: float(values[i, 3] if errors
+                                   else 1 - values[i, 3])}
+        }
+        for i, name in enumerate(names)
+    }
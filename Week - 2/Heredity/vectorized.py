@@ -0,0 +1,85 @@
+import numpy as np
+
+from bayesnet import family_shape, probability_tables
+
+# Gene assignments evaluated at a time
+BLOCK_SIZE = 1 << 16
+
+
+def infer(people, probs, block_size=BLOCK_SIZE):
+    """
+    Return the gene and trait distribution of every person in `people`,
+    in the same form as `heredity.main` computes by enumeration.
+
+    Every assignment of gene counts is enumerated as a row of an integer
+    array, `block_size` rows at a time. The probability of each row is a
+    product of lookups into the founder, inheritance and trait tables,
+    and the marginals are weighted counts over the rows. Unknown traits
+    are summed out by weighting with the probability of the trait given
+    each gene count, rather than enumerated.
+    """
+    names, parents = family_shape(people)
+    n = len(names)
+    prior, inherit, trait = probability_tables(probs)
+
+    # Gene counts are looked up in an extra column of zeros for people
+    # without parents, or without a father
+    founder = np.array([p is None for p in parents])
+    mothers = np.array([n if p is None else p[0] for p in parents],
+                       dtype=np.int64)
+    fathers = np.array([n if p is None or p[1] is None else p[1]
+                        for p in parents], dtype=np.int64)
+
+    # Trait likelihood given gene count, with a column of ones for people
+    # whose trait is unknown
+    known = [people[name]["trait"] for name in names]
+    evidence = np.array([2 if t is None else int(t) for t in known])
+    likelihood = np.column_stack([trait, np.ones(3)])
+    offsets = 3 * np.arange(n)
+
+    genes_total = np.zeros(n * 3)
+    trait_total = np.zeros(n)
+    total = 0.0
+    for start in range(0, 3 ** n, block_size):
+        genes = assignments(n, start, min(start + block_size, 3 ** n))
+        extended = np.column_stack(
+            [genes, np.zeros(len(genes), dtype=genes.dtype)])
+        factors = np.where(
+            founder,
+            prior[genes],
+            inherit[extended[:, mothers], extended[:, fathers], genes]
+        )
+        factors *= likelihood[genes, evidence]
+        weights = factors.prod(axis=1)
+
+        genes_total += np.bincount(
+            (genes + offsets).ravel(),
+            weights=np.repeat(weights, n),
+            minlength=3 * n
+        )
+        trait_total += np.einsum("r,ri->i", weights, trait[genes, 1])
+        total += weights.sum()
+
+    genes_total = genes_total.reshape(n, 3) / total
+    trait_total /= total
+    for i, t in enumerate(known):
+        if t is not None:
+            trait_total[i] = float(t)
+    return {
+        name: {
+            "gene": {g: float(genes_total[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(trait_total[i]),
+                      False: float(1 - trait_total[i])}
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def assignments(n, start, stop):
+    """
+    Return gene assignments `start` to `stop` of `n` people as an array
+    with one row per assignment, reading each assignment's number in
+    base 3 with one digit per person.
+    """
+    numbers = np.arange(start, stop, dtype=np.int64)
+    return (numbers[:, None] // 3 ** np.arange(n, dtype=np.int64)) % 3
@@ -0,0 +1,233 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+from graph import Graph, power_iteration, sample_walks
+
+DAMPING = 0.85
+SIZES = [1000, 10000, 100000, 1000000]
+
+# Tolerance of the reference ranks that errors are measured against
+REFERENCE_TOLERANCE = 1e-12
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark PageRank engines on synthetic link graphs."
+    )
+    parser.add_argument("-n", "--size", type=int, action="append",
+                        help="number of pages (may be repeated)")
+    parser.add_argument("-g", "--generator", choices=GENERATORS,
+                        action="append",
+                        help="graph generator (may be repeated)")
+    parser.add_argument("-e", "--engine", choices=ENGINES, action="append",
+                        help="engine to run (may be repeated)")
+    parser.add_argument("-d", "--degree", type=int, default=8,
+                        help="mean number of links per page")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("--memory", action="store_true",
+                        help="also measure peak memory (slow)")
+    args = parser.parse_args()
+
+    print(f"{'generator':>9} {'pages':>9} {'links':>10} {'engine':>14} "
+          f"{'time':>9} {'peak MB':>8} {'L1 error':>9} {'model':>9}")
+    for name in args.generator or GENERATORS:
+        for n in args.size or SIZES:
+            start = time.perf_counter()
+            graph = GENERATORS[name](n, args.degree, args.seed)
+            built = time.perf_counter() - start
+            references = {
+                True: power_iteration(graph, DAMPING, REFERENCE_TOLERANCE)[0],
+                False: dropped_iteration(graph, DAMPING, REFERENCE_TOLERANCE)
+            }
+            gap = np.abs(references[False] - references[True]).sum()
+            print(f"{name:>9} {n:>9} {len(graph.indices):>10} "
+                  f"{'(generate)':>14} {built:>8.2f}s")
+
+            for engine in args.engine or ENGINES:
+                run, limit, spreads = ENGINES[engine]
+                if n > limit:
+                    continue
+                result = measure(run, graph, args.seed, args.memory)
+                seconds, peak, ranks = result
+
+                # Error is measured against the exact ranks of the engine's
+                # own treatment of dangling pages, and the gap between
+                # those and the standard ranks is shown as the model error
+                error = np.abs(ranks - references[spreads]).sum()
+                model = "" if spreads else f"{gap:>9.2e}"
+                peak = f"{peak / 2 ** 20:>8.1f}" if peak is not None else ""
+                print(f"{'':>9} {'':>9} {'':>10} {engine:>14} "
+                      f"{seconds:>8.2f}s {peak:>8} {error:>9.2e} {model:>9}")
+
+
+def dropped_iteration(graph, damping_factor, tolerance):
+    """
+    Return the ranks of `graph` when the rank of dangling pages is
+    dropped rather than spread over every page, as `iterate_pagerank`
+    does, iterating until the L1 change is below `tolerance`.
+    """
+    n = len(graph)
+    ranks = np.full(n, 1 / n)
+    while True:
+        new_ranks = damping_factor * graph.propagate(ranks) + (
+            1 - damping_factor) / n
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            return ranks
+
+
+def measure(run, graph, seed, memory=False):
+    """
+    Return the seconds `run` takes on `graph`, its peak traced memory in
+    bytes if `memory` is set (in a second run, since tracing slows
+    Python code down), and the ranks it returns.
+    """
+    start = time.perf_counter()
+    ranks = run(graph, seed)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        run(graph, seed)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, ranks
+
+
+def ranks_array(graph, ranks):
+    return np.array([ranks.get(page, 0.0) for page in graph.pages])
+
+
+def run_sample(graph, seed):
+    corpus = graph.to_corpus()
+    ranks = pagerank.sample_pagerank(corpus, DAMPING, pagerank.SAMPLES)
+    return ranks_array(graph, ranks)
+
+
+def run_iterate(graph, seed, **options):
+    corpus = graph.to_corpus()
+    ranks = pagerank.iterate_pagerank(corpus, DAMPING, **options)
+    return ranks_array(graph, ranks)
+
+
+def run_gauss_seidel(graph, seed):
+    return run_iterate(graph, seed, method="gauss-seidel")
+
+
+def run_power(graph, seed):
+    return power_iteration(graph, DAMPING)[0]
+
+
+def run_walk(graph, seed):
+    return sample_walks(graph, DAMPING, 100 * len(graph),
+                        walkers=min(len(graph), 1 << 16), seed=seed)
+
+
+def random_graph(n, degree, seed=None):
+    """
+    Return a graph of `n` pages where each page links to a Poisson
+    number of distinct pages, chosen uniformly at random.
+    """
+    rng = np.random.default_rng(seed)
+    outdegree = rng.poisson(degree, size=n)
+    sources = np.repeat(np.arange(n, dtype=np.int64), outdegree)
+    targets = rng.integers(0, n, size=len(sources))
+    return edge_graph(n, sources, targets)
+
+
+def barabasi_albert(n, degree, seed=None):
+    """
+    Return a scale-free graph of `n` pages grown by preferential
+    attachment: each new page links to `degree` earlier pages, each
+    chosen with probability proportional to its number of links so far.
+
+    Link `k` picks a uniformly random end of one of the links before it,
+    which is its source page if even and, if odd, whatever page that
+    earlier link picked. Those references are resolved by pointer
+    jumping, so the whole graph is drawn with array operations.
+    """
+    rng = np.random.default_rng(seed)
+    m = max(1, degree)
+    links = np.arange(m, n * m, dtype=np.int64)
+    sources = links // m
+    ends = (rng.random(len(links)) * 2 * links).astype(np.int64)
+
+    # Ends refer to endpoint 2k (source of link k) or 2k + 1 (its target)
+    targets = np.where(ends % 2 == 0, ends // 2 // m, -1)
+    refer = np.where(ends % 2 == 0, -1, ends // 2 - m)
+    while True:
+        pending = np.flatnonzero(targets < 0)
+        if not len(pending):
+            break
+        referred = refer[pending]
+        early = referred < 0
+        targets[pending[early]] = 0
+        pending, referred = pending[~early], referred[~early]
+        targets[pending] = targets[referred]
+        refer[pending] = refer[referred]
+    return edge_graph(n, sources, targets)
+
+
+def rmat(n, degree, seed=None, probabilities=(0.57, 0.19, 0.19, 0.05)):
+    """
+    Return an R-MAT graph of `n` pages with about `degree` links per
+    page. Each link picks one quadrant of the adjacency matrix at each
+    of log2(n) levels of recursion, with the given `probabilities`.
+    Pages are shuffled so that rank does not follow page number.
+    """
+    rng = np.random.default_rng(seed)
+    levels = max(1, int(np.ceil(np.log2(n))))
+    count = n * degree
+    sources = np.zeros(count, dtype=np.int64)
+    targets = np.zeros(count, dtype=np.int64)
+    thresholds = np.cumsum(probabilities)
+    for _ in range(levels):
+        quadrant = np.searchsorted(thresholds, rng.random(count) *
+                                   thresholds[-1], side="right")
+        sources = 2 * sources + quadrant // 2
+        targets = 2 * targets + quadrant % 2
+    keep = (sources < n) & (targets < n)
+    permutation = rng.permutation(n)
+    return edge_graph(n, permutation[sources[keep]],
+                      permutation[targets[keep]])
+
+
+def edge_graph(n, sources, targets):
+    """
+    Return a graph of `n` unnamed pages from arrays of link endpoints,
+    dropping self-links and repeated links.
+    """
+    keep = sources != targets
+    links = np.unique(sources[keep].astype(np.int64) * n + targets[keep])
+    sources, targets = np.divmod(links, n)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return Graph(range(n), indptr, targets)
+
+
+GENERATORS = {
+    "uniform": random_graph,
+    "ba": barabasi_albert,
+    "rmat": rmat
+}
+
+# Engines, the largest graph each is run on, since the dictionary based
+# engines cost O(N) per sample or Python-speed sweeps, and whether each
+# spreads the rank of dangling pages over every page or drops it
+ENGINES = {
+    "sample": (run_sample, 2000, True),
+    "iterate": (run_iterate, 100000, False),
+    "gauss-seidel": (run_gauss_seidel, 100000, False),
+    "power": (run_power, float("inf"), True),
+    "walk": (run_walk, float("inf"), True)
+}
+
+
+if __name__ == "__main__":
+    main()
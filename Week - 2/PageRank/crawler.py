@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from graph import Graph
+
+# Same link pattern as pagerank.crawl
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters of a page read at a time
+CHUNK_SIZE = 1 << 20
+
+
+def main():
+    if len(sys.argv) not in [2, 3, 4]:
+        sys.exit("Usage: python crawler.py corpus [processes] [output]")
+    processes = int(sys.argv[2]) if len(sys.argv) >= 3 else None
+    output = sys.argv[3] if len(sys.argv) == 4 else None
+
+    start = time.perf_counter()
+    graph = crawl(sys.argv[1], processes, output=output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Pages: {len(graph)}")
+    print(f"Links: {len(graph.indices)}")
+    print(f"Ingestion time: {elapsed:.3f}s")
+    print(f"Pages/sec: {len(graph) / elapsed:.0f}")
+
+
+def extract_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of link targets in the HTML file at `path`, reading it
+    `chunk_size` characters at a time so that large pages are never held
+    in memory whole.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            buffer = tail + chunk
+            end = 0
+            for match in LINK.finditer(buffer):
+                links.add(match.group(1))
+                end = match.end()
+
+            # A tag still open at the end of the buffer may be a link
+            # that continues in the next chunk
+            start = buffer.rfind("<", end)
+            tail = buffer[start:] if start != -1 else ""
+    return links
+
+
+def crawl_file(task):
+    directory, filename, chunk_size = task
+    return filename, extract_links(os.path.join(directory, filename),
+                                   chunk_size)
+
+
+def crawl(directory, processes=None, chunk_size=CHUNK_SIZE, output=None):
+    """
+    Parse a directory of HTML pages across a pool of `processes` workers
+    and return its link graph as a `graph.Graph`, with the same pages
+    and links as `pagerank.crawl`. If `output` is given, the graph is
+    also saved there for `graph.Graph.load`.
+    """
+    filenames = sorted(
+        sys.intern(filename) for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+    tasks = [(directory, filename, chunk_size) for filename in filenames]
+    if processes == 1:
+        graph = build_graph(filenames, map(crawl_file, tasks))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.imap_unordered(crawl_file, tasks, chunksize=64)
+            graph = build_graph(filenames, results)
+    if output is not None:
+        graph.save(output)
+    return graph
+
+
+def build_graph(pages, results):
+    """
+    Return the graph of `pages` from (page, links) pairs, keeping only
+    links to other pages in the corpus.
+    """
+    index = {page: i for i, page in enumerate(pages)}
+    targets = [None] * len(pages)
+    for page, links in results:
+        i = index[page]
+        targets[i] = sorted(
+            index[link] for link in links
+            if link in index and index[link] != i
+        )
+    outdegree = np.array([len(links) for links in targets], dtype=np.int64)
+    indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(outdegree, out=indptr[1:])
+    indices = np.fromiter(
+        (j for links in targets for j in links),
+        dtype=np.int32, count=int(indptr[-1])
+    )
+    return Graph(pages, indptr, indices)
+
+
+if __name__ == "__main__":
+    main()
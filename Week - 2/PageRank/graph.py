@@ -0,0 +1,295 @@
+import numpy as np
+
+# File signature and header layout of saved graphs: the signature, then
+# the number of pages, links and bytes of page names as little-endian
+# 64-bit integers
+MAGIC = b"PRGRAPH1"
+HEADER = np.dtype([("magic", "S8"), ("pages", "<u8"), ("links", "<u8"),
+                   ("names", "<u8")])
+
+
+class Graph():
+    """
+    Link graph of a corpus in compressed sparse row (CSR) form.
+
+    Pages are numbered in the order of `pages`. The pages linked to by
+    page `i` are `indices[indptr[i]:indptr[i + 1]]`.
+    """
+
+    def __init__(self, pages, indptr, indices):
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.outdegree = np.diff(self.indptr)
+        self.dangling = np.flatnonzero(self.outdegree == 0)
+        self.matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a dictionary mapping each page to the set of
+        pages it links to, as returned by `crawl`.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        indices = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page])
+            indices.extend(links)
+            indptr[i + 1] = indptr[i] + len(links)
+        return cls(pages, indptr, indices)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a graph saved with `save`. The link arrays are memory-mapped
+        from the file rather than read into memory.
+        """
+        header = np.fromfile(path, dtype=HEADER, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a saved graph")
+        n, m = int(header["pages"]), int(header["links"])
+
+        offset = HEADER.itemsize
+        indptr = np.memmap(path, dtype="<i8", mode="r",
+                           offset=offset, shape=(n + 1,))
+        offset += indptr.nbytes
+        indices = np.memmap(path, dtype="<i4", mode="r",
+                            offset=offset, shape=(m,)) if m else []
+        offset += 4 * m + (4 * m) % 8
+        name_offsets = np.fromfile(path, dtype="<i8", count=n + 1,
+                                   offset=offset)
+        offset += name_offsets.nbytes
+        with open(path, "rb") as f:
+            f.seek(offset)
+            names = f.read(int(header["names"]))
+        pages = [
+            names[name_offsets[i]:name_offsets[i + 1]].decode()
+            for i in range(n)
+        ]
+        return cls(pages, indptr, indices)
+
+    def save(self, path):
+        """
+        Save the graph to `path` as a header, the CSR offsets and link
+        targets, and a table of page names, each section aligned so that
+        `load` can memory-map it.
+        """
+        names = [page.encode() for page in self.pages]
+        name_offsets = np.zeros(len(names) + 1, dtype="<i8")
+        np.cumsum([len(name) for name in names], out=name_offsets[1:])
+        header = np.array(
+            [(MAGIC, len(self), len(self.indices), name_offsets[-1])],
+            dtype=HEADER
+        )
+        with open(path, "wb") as f:
+            f.write(header.tobytes())
+            f.write(self.indptr.astype("<i8").tobytes())
+            f.write(self.indices.astype("<i4").tobytes())
+            f.write(bytes((4 * len(self.indices)) % 8))
+            f.write(name_offsets.tobytes())
+            f.write(b"".join(names))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def links(self, i):
+        """
+        Return the indices of the pages linked to by page `i`.
+        """
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def to_corpus(self):
+        """
+        Return the graph as a dictionary of page names to sets of pages.
+        """
+        return {
+            page: set(self.pages[j] for j in self.links(i))
+            for i, page in enumerate(self.pages)
+        }
+
+    def sources(self):
+        """
+        Return, for every link, the index of the page it starts from.
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int32),
+                         self.outdegree)
+
+    def propagate(self, ranks):
+        """
+        Return the rank every page receives through links when each
+        page splits `ranks` evenly among the pages it links to.
+        Dangling pages pass on nothing.
+        """
+        if self.matrix is None:
+            self.matrix = self.transition_matrix()
+        if self.matrix is not False:
+            return self.matrix @ ranks
+
+        # Without SciPy, scatter each link's share with a weighted count
+        shares = np.zeros(len(self))
+        linked = self.outdegree > 0
+        shares[linked] = ranks[linked] / self.outdegree[linked]
+        return np.bincount(self.indices, weights=shares[self.sources()],
+                           minlength=len(self))
+
+    def transition_matrix(self):
+        """
+        Return the column-stochastic link matrix as a SciPy CSR matrix,
+        or False if SciPy is not installed.
+        """
+        try:
+            from scipy import sparse
+        except ImportError:
+            return False
+        n = len(self)
+        weights = np.zeros(n)
+        linked = self.outdegree > 0
+        weights[linked] = 1 / self.outdegree[linked]
+
+        # The CSR layout of the graph is the CSC layout of its transpose
+        return sparse.csc_matrix(
+            (weights[self.sources()], self.indices, self.indptr),
+            shape=(n, n)
+        ).tocsr()
+
+
+def power_iteration(graph, damping_factor, tolerance=0.001, ranks=None,
+                    max_iterations=1000):
+    """
+    Return the PageRank vector of `graph` and the number of iterations
+    taken, iterating until the L1 change between iterations is below
+    `tolerance`. Iteration starts from `ranks`, or uniform ranks.
+
+    Dangling pages are treated as linking to every page, which is
+    applied as a rank-one correction rather than stored in the matrix.
+    """
+    n = len(graph)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    d = damping_factor
+    for iteration in range(1, max_iterations + 1):
+        dangling = ranks[graph.dangling].sum()
+        new_ranks = d * graph.propagate(ranks) + (d * dangling + 1 - d) / n
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def sample_walks(graph, damping_factor, n, walkers=1024, seed=None):
+    """
+    Return PageRank estimates for `graph` from `n` samples, taken by
+    `walkers` random surfers moving in lockstep from random pages.
+
+    Each step is decomposed into two stages: with probability
+    `1 - damping_factor` (or always, on a dangling page) the surfer
+    teleports to a uniformly random page, and otherwise it follows one
+    of the current page's links chosen uniformly. Both stages take
+    constant time per surfer, whatever the size of the corpus.
+    """
+    rng = np.random.default_rng(seed)
+    pages = len(graph)
+    walkers = max(1, min(walkers, n))
+    positions = rng.integers(0, pages, size=walkers)
+    visits = np.zeros(pages, dtype=np.int64)
+    pending = []
+    pending_size = 0
+
+    remaining = n
+    while remaining > 0:
+        degree = graph.outdegree[positions]
+        follow = np.flatnonzero(
+            (rng.random(walkers) < damping_factor) & (degree > 0))
+        offsets = (rng.random(len(follow)) * degree[follow]).astype(np.int64)
+        next_positions = rng.integers(0, pages, size=walkers)
+        next_positions[follow] = graph.indices[
+            graph.indptr[positions[follow]] + offsets]
+        positions = next_positions
+
+        # The last step may only need some of the surfers' pages, and
+        # visits are counted in batches so that a step costs O(walkers)
+        counted = positions[:min(remaining, walkers)]
+        pending.append(counted)
+        pending_size += len(counted)
+        remaining -= len(counted)
+        if pending_size >= 1 << 22 or remaining == 0:
+            visits += np.bincount(np.concatenate(pending), minlength=pages)
+            pending = []
+            pending_size = 0
+
+    return visits / n
+
+
+def personalized_iteration(graph, damping_factor, teleports,
+                           tolerance=0.001, max_iterations=1000):
+    """
+    Return personalized PageRank vectors for each row of `teleports`, a
+    (k, n) array of teleport weights over the pages of `graph`, and the
+    number of iterations taken.
+
+    All k vectors are solved together by block power iteration: every
+    iteration is one sparse product with an (n, k) block. Teleports and
+    rank from dangling pages go to each vector's own teleport
+    distribution. Iteration stops once every vector's L1 change is below
+    `tolerance`.
+    """
+    teleports = np.atleast_2d(np.asarray(teleports, dtype=np.float64))
+    teleports = (teleports / teleports.sum(axis=1, keepdims=True)).T
+    d = damping_factor
+    ranks = teleports.copy()
+    for iteration in range(1, max_iterations + 1):
+        dangling = ranks[graph.dangling].sum(axis=0)
+        new_ranks = (d * graph.propagate(ranks)
+                     + (d * dangling + 1 - d) * teleports)
+        change = np.abs(new_ranks - ranks).sum(axis=0).max()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks.T, iteration
+
+
+def walk_count(error, confidence):
+    """
+    Return how many walks make every Monte Carlo estimate lie within
+    `error` of its exact value with probability `confidence`, by
+    Hoeffding's inequality.
+    """
+    return int(np.ceil(np.log(2 / (1 - confidence)) / (2 * error ** 2)))
+
+
+def sample_personalized(graph, damping_factor, seeds, error=0.01,
+                        confidence=0.95, seed=None):
+    """
+    Return a Monte Carlo estimate of the personalized PageRank of the
+    pages in `seeds`, a list of page indices teleported to uniformly.
+
+    Each walk starts at a random seed page, stops with probability
+    `1 - damping_factor` before every step, jumps back to a random seed
+    page from a dangling page, and otherwise follows a random link. The
+    fraction of walks ending at a page estimates its rank. Enough walks
+    are run for every estimate to be within `error` of the exact value
+    with probability `confidence`.
+    """
+    rng = np.random.default_rng(seed)
+    seeds = np.asarray(seeds, dtype=np.int64)
+    walks = walk_count(error, confidence)
+    positions = seeds[rng.integers(0, len(seeds), size=walks)]
+    ends = []
+    while len(positions):
+        stop = rng.random(len(positions)) >= damping_factor
+        ends.append(positions[stop])
+        positions = positions[~stop]
+
+        degree = graph.outdegree[positions]
+        linked = degree > 0
+        offsets = (rng.random(len(positions)) * degree).astype(np.int64)
+        next_positions = seeds[rng.integers(0, len(seeds),
+                                            size=len(positions))]
+        next_positions[linked] = graph.indices[
+            graph.indptr[positions[linked]] + offsets[linked]]
+        positions = next_positions
+    return np.bincount(np.concatenate(ends), minlength=len(graph)) / walks
@@ -0,0 +1,280 @@
+import argparse
+import heapq
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from crawler import extract_links
+from graph import Graph, power_iteration
+
+DAMPING = 0.85
+TOLERANCE = 0.001
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Refresh PageRank for a corpus from saved state."
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("state", nargs="?",
+                        help="file holding the last ranks and links "
+                             "(not used with --benchmark)")
+    parser.add_argument("--push", action="store_true",
+                        help="update ranks by pushing residuals")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time a refresh after editing one page of a "
+                             "copy of the corpus")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_edit(args.corpus, args.push)
+        return
+    if args.state is None:
+        parser.error("the state file is required unless --benchmark is given")
+
+    start = time.perf_counter()
+    graph, ranks, stats = refresh(args.corpus, args.state, push=args.push)
+    elapsed = time.perf_counter() - start
+    print(f"Refreshed {len(graph)} pages in {elapsed:.3f}s "
+          f"({stats['parsed']} parsed, {stats['removed']} removed, "
+          f"{stats['iterations']} iterations, {stats['pushes']} pushes)")
+    for i in np.argsort(-ranks)[:10]:
+        print(f"  {graph.pages[i]}: {ranks[i]:.4f}")
+
+
+def load_state(path):
+    """
+    Return the state saved at `path` by `save_state`, or None.
+
+    The state holds a table of `names`, the name of each page, the raw
+    links of each page as CSR offsets into the name table (so links to
+    pages that do not exist yet are remembered), each page's
+    modification time and its last rank.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def save_state(path, state):
+    # Write to a temporary file first so a failed save keeps the old state
+    temporary = path + ".tmp.npz"
+    np.savez(temporary, **state)
+    os.replace(temporary, path)
+
+
+def refresh(directory, state_path, damping_factor=DAMPING,
+            tolerance=TOLERANCE, push=False):
+    """
+    Bring the PageRank of the corpus in `directory` up to date, reparsing
+    only pages that are new or whose modification time changed since the
+    state in `state_path` was saved, and save the new state.
+
+    Iteration warm-starts from the previous ranks. With `push`, ranks
+    are instead corrected by pushing residuals from the pages where they
+    are largest, which touches little of the graph when the changes
+    are local.
+
+    Return the graph, its ranks, and counts of the work done.
+    """
+    files = sorted(f for f in os.listdir(directory) if f.endswith(".html"))
+    mtimes = np.array(
+        [os.stat(os.path.join(directory, f)).st_mtime_ns for f in files],
+        dtype=np.int64
+    )
+    state = load_state(state_path)
+    if state is None:
+        state = {
+            "names": np.array([], dtype=str),
+            "page_names": np.array([], dtype=np.int64),
+            "indptr": np.zeros(1, dtype=np.int64),
+            "indices": np.array([], dtype=np.int64),
+            "mtimes": np.array([], dtype=np.int64),
+            "ranks": np.array([], dtype=np.float64)
+        }
+
+    names = state["names"].tolist()
+    name_ids = {name: i for i, name in enumerate(names)}
+    old_pages = {names[k]: j for j, k in enumerate(state["page_names"])}
+
+    def name_id(name):
+        if name not in name_ids:
+            name_ids[name] = len(names)
+            names.append(name)
+        return name_ids[name]
+
+    # Reuse the links of every page that has not been modified
+    n = len(files)
+    kept = np.full(n, -1, dtype=np.int64)
+    parsed = {}
+    for i, filename in enumerate(files):
+        j = old_pages.get(filename)
+        if j is not None and state["mtimes"][j] == mtimes[i]:
+            kept[i] = j
+        else:
+            links = extract_links(os.path.join(directory, filename))
+            parsed[i] = sorted(name_id(link) for link in links)
+    page_names = np.array([name_id(f) for f in files], dtype=np.int64)
+
+    # Assemble the raw links, gathering unmodified rows in one step
+    old_indptr = state["indptr"]
+    degree = np.zeros(n, dtype=np.int64)
+    reused = np.flatnonzero(kept >= 0)
+    degree[reused] = np.diff(old_indptr)[kept[reused]]
+    for i, links in parsed.items():
+        degree[i] = len(links)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(degree, out=indptr[1:])
+    indices = np.empty(indptr[-1], dtype=np.int64)
+    lengths = degree[reused]
+    within = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths)
+    indices[np.repeat(indptr[reused], lengths) + within] = state["indices"][
+        np.repeat(old_indptr[kept[reused]], lengths) + within]
+    for i, links in parsed.items():
+        indices[indptr[i]:indptr[i + 1]] = links
+
+    graph = link_graph(files, page_names, len(names), indptr, indices)
+
+    # Start from the previous ranks, with new pages at 1 / n
+    ranks = np.full(n, 1 / n if n else 0.0)
+    for i, filename in enumerate(files):
+        j = old_pages.get(filename)
+        if j is not None:
+            ranks[i] = state["ranks"][j]
+    if n:
+        ranks /= ranks.sum()
+
+    iterations = pushes = 0
+    if push and len(old_pages):
+        ranks, pushes = push_residuals(graph, damping_factor, tolerance,
+                                       ranks)
+    elif n:
+        ranks, iterations = power_iteration(graph, damping_factor,
+                                            tolerance, ranks)
+
+    save_state(state_path, {
+        "names": np.array(names, dtype=str),
+        "page_names": page_names,
+        "indptr": indptr,
+        "indices": indices,
+        "mtimes": mtimes,
+        "ranks": ranks
+    })
+    stats = {
+        "parsed": len(parsed),
+        "removed": len(set(old_pages) - set(files)),
+        "iterations": iterations,
+        "pushes": pushes
+    }
+    return graph, ranks, stats
+
+
+def link_graph(pages, page_names, names, indptr, indices):
+    """
+    Return the graph of `pages` from raw links into a name table,
+    keeping only links to other pages in the corpus.
+    """
+    n = len(pages)
+    page_of_name = np.full(names, -1, dtype=np.int64)
+    page_of_name[page_names] = np.arange(n)
+    sources = np.repeat(np.arange(n), np.diff(indptr))
+    targets = page_of_name[indices]
+    keep = (targets >= 0) & (targets != sources)
+    graph_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources[keep], minlength=n), out=graph_indptr[1:])
+    return Graph(pages, graph_indptr, targets[keep])
+
+
+def push_residuals(graph, damping_factor, tolerance, ranks,
+                   max_pushes=None):
+    """
+    Return ranks corrected by Gauss-Southwell residual pushes, and the
+    number of pushes made, starting from approximate `ranks`.
+
+    The residual of every page is computed once. Then the page with the
+    largest residual repeatedly adds it to its own rank and passes
+    `damping_factor` of it on through its links, until no residual
+    exceeds `tolerance / n`. Residual pushed from dangling pages reaches
+    every page equally, so it is accumulated and applied at the end,
+    in proportion to the ranks. Falls back to power iteration if more
+    than `max_pushes` (by default, the number of links) are needed.
+    """
+    n = len(graph)
+    d = damping_factor
+    ranks = ranks.copy()
+    dangling = ranks[graph.dangling].sum()
+    residual = (1 - d + d * dangling) / n + d * graph.propagate(ranks) - ranks
+    threshold = tolerance / n
+    if max_pushes is None:
+        max_pushes = max(len(graph.indices), n)
+
+    heap = [(-abs(r), int(i)) for i, r in enumerate(residual)
+            if abs(r) > threshold]
+    heapq.heapify(heap)
+    uniform = 0.0
+    pushes = 0
+    while heap:
+        _, u = heapq.heappop(heap)
+        r = residual[u]
+        if abs(r) <= threshold:
+            continue
+        pushes += 1
+        if pushes > max_pushes:
+            return power_iteration(graph, d, tolerance, ranks)[0], pushes
+        ranks[u] += r
+        residual[u] = 0.0
+        degree = graph.outdegree[u]
+        if degree == 0:
+            uniform += d * r / n
+            continue
+        links = graph.links(u)
+        residual[links] += d * r / degree
+        for v in links[np.abs(residual[links]) > threshold]:
+            heapq.heappush(heap, (-abs(residual[v]), int(v)))
+
+    # A residual of c on every page raises the ranks by c * n / (1 - d)
+    # times the PageRank vector itself
+    ranks += uniform * n / (1 - d) * ranks / ranks.sum()
+    return ranks / ranks.sum(), pushes
+
+
+def benchmark_edit(directory, push=False):
+    """
+    Time a full crawl and ranking of a copy of `directory`, then the
+    refresh after one page gains a link to another page.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        corpus = os.path.join(scratch, "corpus")
+        state = os.path.join(scratch, "state.npz")
+        shutil.copytree(directory, corpus)
+
+        start = time.perf_counter()
+        graph, ranks, _ = refresh(corpus, state)
+        print(f"Initial ranking: {time.perf_counter() - start:.3f}s")
+
+        page, target = random.sample(graph.pages, 2)
+        with open(os.path.join(corpus, page), "a") as f:
+            f.write(f'<a href="{target}">{target}</a>\n')
+        st = os.stat(os.path.join(corpus, page))
+        os.utime(os.path.join(corpus, page),
+                 ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+        start = time.perf_counter()
+        graph, ranks, stats = refresh(corpus, state, push=push)
+        elapsed = time.perf_counter() - start
+        print(f"Refresh after editing {page}: {elapsed:.3f}s "
+              f"({stats['iterations']} iterations, "
+              f"{stats['pushes']} pushes)")
+
+        exact, _ = power_iteration(graph, DAMPING, 1e-12)
+        print(f"L1 error: {np.abs(ranks - exact).sum():.2e}")
+
+
+if __name__ == "__main__":
+    main()
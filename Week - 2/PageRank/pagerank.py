@@ -6,11 +6,14 @@ import sys
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Update rules for iterate_pagerank
+METHODS = ("jacobi", "gauss-seidel")
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in [2, 3] or sys.argv[2:] not in [[], ["--compare"]]:
+        sys.exit("Usage: python pagerank.py corpus [--compare]")
+    corpus = load(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -19,6 +22,29 @@ def main():
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if len(sys.argv) == 3:
+        compare_iterations(corpus, DAMPING)
+
+
+def compare_iterations(corpus, damping_factor, tolerance=1e-8):
+    """
+    Print how many sweeps each iteration method needs to converge to
+    `tolerance`, and its residuals.
+    """
+    exact = iterate_pagerank(corpus, damping_factor, tolerance=1e-14)
+    print(f"Sweeps to converge (tolerance = {tolerance})")
+    for method in METHODS:
+        for extrapolation in EXTRAPOLATIONS:
+            residuals = []
+            ranks = iterate_pagerank(
+                corpus, damping_factor, tolerance=tolerance, method=method,
+                extrapolation=extrapolation, residuals=residuals
+            )
+            error = distance(corpus, exact, ranks)
+            name = method + (f" + {extrapolation}" if extrapolation else "")
+            print(f"  {name}: {len(residuals)} sweeps, L1 error {error:.2e}")
+            print("    residuals: " + " ".join(
+                f"{r:.1e}" for r in residuals))
 
 
 def crawl(directory):
@@ -48,6 +74,18 @@ def crawl(directory):
     return pages
 
 
+def load(path):
+    """
+    Return the corpus at `path`: a directory of HTML pages, which is
+    crawled, or a graph file saved by `crawler.py`, which is loaded
+    without parsing any HTML.
+    """
+    if os.path.isdir(path):
+        return crawl(path)
+    from graph import Graph
+    return Graph.load(path).to_corpus()
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -113,46 +151,238 @@ def sample_pagerank(corpus, damping_factor, n):
     #raise NotImplementedError
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, norm="l1",
+                     method="jacobi", extrapolation=None, period=10,
+                     residuals=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    Iteration stops once the `norm` ("l1", "l2" or "linf") of the change
+    in one sweep is below `tolerance`. With `method` "jacobi" every sweep
+    uses the previous sweep's values; with "gauss-seidel" pages are
+    updated in place, so later pages already see this sweep's values.
+    With `extrapolation` "aitken" or "quadratic", every `period` sweeps
+    the last iterates are extrapolated towards the limit; if the sweep
+    after an extrapolation changes the ranks more than the sweep before
+    it did, the extrapolation is thrown away and iteration goes on from
+    the last iterate. If `residuals` is a list, the change of every
+    sweep is appended to it.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if extrapolation not in EXTRAPOLATIONS:
+        raise ValueError(f"extrapolation must be one of {EXTRAPOLATIONS}")
     pd = uniform(corpus)
     n=len(corpus)
     d=damping_factor
-    npd={}
+
+    # Pages linking to each page, found once rather than every sweep
+    incoming = {current: [] for current in corpus}
+    for i in corpus:
+        for link in corpus[i]:
+            incoming[link].append(i)
+
+    # Without pages lacking links, every Jacobi sweep keeps a total of 1
+    conserving = all(corpus[i] for i in corpus)
+
+    history = [pd]
+    sweeps = 0
+    trial = None
     while True:
-        #print("1")
+        npd = pd.copy() if method == "gauss-seidel" else {}
+        source = npd if method == "gauss-seidel" else pd
         for current in corpus:
-            nl=len(corpus[current])
             prlinks=0.0
-            for i in corpus:
-                if current in corpus[i]:
-                    #print(pd[i])
-                    prlinks += float(pd[i]/float(len(corpus[i])))
+            for i in incoming[current]:
+                prlinks += float(source[i]/float(len(corpus[i])))
             npd[current]=((1-d)/n)+(d*prlinks)
-            #print("npd[current]",npd[current])
-        #print(pd)
-        #print(npd)
-        if converge(corpus, pd, npd):
+        if method == "gauss-seidel" and conserving:
+            # In-place sweeps do not conserve the total rank, and an error
+            # in the total only decays by a factor of `d` per sweep
+            total = sum(npd.values())
+            npd = {page: value / total for page, value in npd.items()}
+        sweeps += 1
+        change = distance(corpus, pd, npd, norm)
+        if residuals is not None:
+            residuals.append(change)
+        if trial is not None:
+            iterate, previous = trial
+            trial = None
+            if change > previous:
+                pd = iterate
+                history = [pd]
+                continue
+        if converge(corpus, pd, npd, tolerance, norm):
             break
-        pd=npd.copy()
+
+        history = history[-3:] + [npd]
+        if extrapolation and sweeps % period == 0:
+            trial = (npd, change)
+            npd = EXTRAPOLATIONS[extrapolation](corpus, history)
+            history = [npd]
+        pd=npd
 
     return npd
     #raise NotImplementedError
-def converge(corpus, pd, npd):
-    update=0
-    for i in corpus:
-        update+=abs(npd[i]-pd[i])
-    if update<0.001:
-        return True
-    else:
-        return False
+
+
+def aitken(corpus, history):
+    """
+    Return Aitken's delta-squared extrapolation of the last three
+    iterates, page by page, scaled to the total of the latest iterate.
+    """
+    x0, x1, x2 = history[-3:]
+    extrapolated = {}
+    for page in corpus:
+        denominator = x2[page] - 2 * x1[page] + x0[page]
+        value = x2[page]
+        if abs(denominator) > 1e-15:
+            value -= (x2[page] - x1[page]) ** 2 / denominator
+        extrapolated[page] = value if value > 0 else x2[page]
+    scale = sum(x2.values()) / sum(extrapolated.values())
+    return {page: value * scale for page, value in extrapolated.items()}
+
+
+def quadratic(corpus, history):
+    """
+    Return the quadratic extrapolation of Kamvar et al. (2003) from the
+    last four iterates, scaled to the total of the latest iterate.
+    """
+    if len(history) < 4:
+        return history[-1]
+    x0, x1, x2, x3 = history[-4:]
+    y = [[x[page] - x0[page] for page in corpus] for x in (x1, x2, x3)]
+
+    # Least squares for [y1 y2] (g1, g2) = -y3 via the normal equations
+    a11 = sum(u * u for u in y[0])
+    a12 = sum(u * v for u, v in zip(y[0], y[1]))
+    a22 = sum(v * v for v in y[1])
+    b1 = -sum(u * w for u, w in zip(y[0], y[2]))
+    b2 = -sum(v * w for v, w in zip(y[1], y[2]))
+    determinant = a11 * a22 - a12 * a12
+    if abs(determinant) < 1e-30:
+        return x3
+    g1 = (b1 * a22 - b2 * a12) / determinant
+    g2 = (a11 * b2 - a12 * b1) / determinant
+    beta0, beta1, beta2 = g1 + g2 + 1, g2 + 1, 1
+
+    extrapolated = {
+        page: beta0 * x1[page] + beta1 * x2[page] + beta2 * x3[page]
+        for page in corpus
+    }
+    if any(value <= 0 for value in extrapolated.values()):
+        return x3
+    scale = sum(x3.values()) / sum(extrapolated.values())
+    return {page: value * scale for page, value in extrapolated.items()}
+
+
+def walk_pagerank(corpus, damping_factor, n, walkers=1024, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    `walkers` surfers moving at once, each step costing constant time
+    instead of building a transition model. `corpus` is a dictionary as
+    returned by `crawl`, or a `graph.Graph`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    from graph import Graph, sample_walks
+
+    if not isinstance(corpus, Graph):
+        corpus = Graph.from_corpus(corpus)
+    ranks = sample_walks(corpus, damping_factor, n, walkers, seed)
+    return dict(zip(corpus.pages, ranks.tolist()))
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, tolerance=0.001):
+    """
+    Return personalized PageRank values for each seed set in `seeds`,
+    solved together on one sparse transition matrix. A seed set is a
+    collection of pages teleported to uniformly, or a dictionary mapping
+    pages to teleport weights. `corpus` is a dictionary as returned by
+    `crawl`, or a `graph.Graph`.
+
+    Return a list with, for each seed set, a dictionary where keys are
+    page names and values are their PageRank values, summing to 1.
+    """
+    import numpy as np
+    from graph import Graph, personalized_iteration
+
+    if not isinstance(corpus, Graph):
+        corpus = Graph.from_corpus(corpus)
+    teleports = np.zeros((len(seeds), len(corpus)))
+    for k, seed in enumerate(seeds):
+        weights = seed if isinstance(seed, dict) else dict.fromkeys(seed, 1)
+        for page, weight in weights.items():
+            teleports[k, corpus.index[page]] = weight
+    ranks, _ = personalized_iteration(corpus, damping_factor, teleports,
+                                      tolerance)
+    return [dict(zip(corpus.pages, row.tolist())) for row in ranks]
+
+
+def sample_personalized_pagerank(corpus, damping_factor, seeds, error=0.01,
+                                 confidence=0.95, seed=None):
+    """
+    Return Monte Carlo estimates of the personalized PageRank of the
+    pages in the set `seeds`, each within `error` of its exact value
+    with probability `confidence`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value.
+    """
+    from graph import Graph, sample_personalized
+
+    if not isinstance(corpus, Graph):
+        corpus = Graph.from_corpus(corpus)
+    ranks = sample_personalized(
+        corpus, damping_factor, [corpus.index[page] for page in seeds],
+        error, confidence, seed
+    )
+    return dict(zip(corpus.pages, ranks.tolist()))
+
+
+def power_pagerank(corpus, damping_factor, tolerance=0.001):
+    """
+    Return PageRank values for each page by power iteration on a sparse
+    transition matrix, built once from `corpus` (a dictionary as returned
+    by `crawl`, or a `graph.Graph`). Pages with no links are treated as
+    linking to every page, as in `transition_model`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value. All PageRank values sum to 1.
+    """
+    from graph import Graph, power_iteration
+
+    if not isinstance(corpus, Graph):
+        corpus = Graph.from_corpus(corpus)
+    ranks, _ = power_iteration(corpus, damping_factor, tolerance)
+    return dict(zip(corpus.pages, ranks.tolist()))
+
+
+def converge(corpus, pd, npd, tolerance=0.001, norm="l1"):
+    return distance(corpus, pd, npd, norm) < tolerance
+
+
+def distance(corpus, pd, npd, norm="l1"):
+    """
+    Return the `norm` ("l1", "l2" or "linf") of the change from `pd`
+    to `npd`.
+    """
+    changes = [abs(npd[i]-pd[i]) for i in corpus]
+    if norm == "l1":
+        return sum(changes)
+    elif norm == "l2":
+        return sum(change ** 2 for change in changes) ** 0.5
+    elif norm == "linf":
+        return max(changes, default=0.0)
+    raise ValueError(f"unknown norm: {norm}")
+
+
 def uniform(corpus):
     pd={}
     n=len(corpus)
@@ -164,5 +394,13 @@ def next_node(corpus,pd,lis):
     weight=[pd[i] for i in lis]
     return random.choices(lis,weight).pop()
 
+# Extrapolations for iterate_pagerank
+EXTRAPOLATIONS = {
+    None: None,
+    "aitken": aitken,
+    "quadratic": quadratic
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,335 @@
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import deque
+
+from crossword import Crossword
+from generate import CREATORS, BitsetCrosswordCreator
+
+SIZES = [1000, 10000, 100000]
+
+# Directory of the structures filled by full solves, and the number of
+# random words added to the words of each structure's planted fill
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SOLVE_SIZE = 100000
+
+# Sizes of the structures generated for full solves, each from the
+# seed equal to its size
+GRIDS = [5, 9, 13, 15, 21]
+
+# Solvers timed on full solves, as (solver, inference), all on bitset
+# domains, and the seconds each may take on an instance
+SOLVES = {
+    "forward": ("backtrack", "forward"),
+    "mac": ("backtrack", "mac"),
+    "restarts": ("restarts", "forward"),
+    "mac-restarts": ("restarts", "mac")
+}
+TIMEOUT = 60
+
+# Creators and the largest vocabulary each is run on, since revising
+# set domains compares every pair of words
+LIMITS = {
+    "set": 10000,
+    "bitset": float("inf")
+}
+
+# Approximate frequency of each letter in English text, in percent
+LETTERS = {
+    "E": 12.7, "T": 9.1, "A": 8.2, "O": 7.5, "I": 7.0, "N": 6.7, "S": 6.3,
+    "H": 6.1, "R": 6.0, "D": 4.3, "L": 4.0, "C": 2.8, "U": 2.8, "M": 2.4,
+    "W": 2.4, "F": 2.2, "G": 2.0, "Y": 2.0, "P": 1.9, "B": 1.5, "V": 1.0,
+    "K": 0.8, "J": 0.2, "X": 0.2, "Q": 0.1, "Z": 0.1
+}
+
+# Grid used when no structure file is given
+STRUCTURE = """\
+_______
+_#_#_#_
+_______
+_#_#_#_
+_______
+_#_#_#_
+_______
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark node and arc consistency on synthetic "
+                    "vocabularies, or full solves of newspaper-style grids."
+    )
+    parser.add_argument("-n", "--size", type=int, action="append",
+                        help="number of words (may be repeated)")
+    parser.add_argument("-c", "--creator", choices=CREATORS,
+                        action="append",
+                        help="creator to run (may be repeated)")
+    parser.add_argument("-s", "--structure", action="append",
+                        help="structure file (default: a 7x7 grid, or the "
+                             "structures in data/ with --solve; may be "
+                             "repeated)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--solve", action="store_true",
+                        help="time full solves instead, of structures with a "
+                             "fill planted among random words")
+    parser.add_argument("--solver", choices=SOLVES, action="append",
+                        help="solver to run with --solve (may be repeated)")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help="seconds allowed for each solve")
+    parser.add_argument("-o", "--output",
+                        help="with --solve, also write the words of each "
+                             "structure to this directory")
+    parser.add_argument("--structures", action="store_true",
+                        help="write the benchmark structures to data/")
+    args = parser.parse_args()
+
+    if args.structures:
+        write_structures()
+    elif args.solve:
+        solve_benchmark(args)
+    else:
+        consistency_benchmark(args)
+
+
+def consistency_benchmark(args):
+    """
+    Time node and arc consistency for each vocabulary size and creator.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        structure = args.structure[0] if args.structure else None
+        if structure is None:
+            structure = os.path.join(scratch, "structure.txt")
+            with open(structure, "w") as f:
+                f.write(STRUCTURE)
+
+        print(f"{'words':>7} {'creator':>8} {'load':>8} {'ac3':>9} "
+              f"{'revisions':>10} {'remaining':>10}")
+        for n in args.size or SIZES:
+            words = os.path.join(scratch, "words.txt")
+            with open(words, "w") as f:
+                f.write("\n".join(synthetic_words(n, args.seed)))
+
+            for name in args.creator or CREATORS:
+                if n > LIMITS[name]:
+                    continue
+                load, seconds, creator = measure(CREATORS[name],
+                                                 structure, words)
+                remaining = sum(len(d) for d in creator.domains.values())
+                print(f"{n:>7} {name:>8} {load:>7.3f}s {seconds:>8.3f}s "
+                      f"{creator.stats['revisions']:>10} {remaining:>10}")
+
+
+def solve_benchmark(args):
+    """
+    Time full solves of each structure by each solver, reporting the
+    nodes expanded and backtracks of every instance. Each solve runs in a
+    worker process, so that one that runs out of time can be stopped.
+    """
+    structures = args.structure or [
+        os.path.join(DATA, f"structure{size}.txt") for size in GRIDS
+    ]
+    with tempfile.TemporaryDirectory() as scratch:
+        print(f"{'structure':>16} {'words':>7} {'solver':>12} {'time':>9} "
+              f"{'nodes':>8} {'backtracks':>10} {'restarts':>8} "
+              f"{'backjumps':>9}")
+        for structure in structures:
+            name = os.path.basename(structure)
+            for n in args.size or [SOLVE_SIZE]:
+                words = os.path.join(
+                    args.output or scratch,
+                    name.replace("structure", "words", 1) if args.output
+                    else "words.txt"
+                )
+                with open(words, "w") as f:
+                    f.write("\n".join(planted_words(structure, n, args.seed)))
+
+                for solver in args.solver or SOLVES:
+                    with multiprocessing.Pool(1) as pool:
+                        result = pool.apply_async(
+                            solve, (structure, words, solver, args.seed))
+                        try:
+                            seconds, stats, solved = result.get(args.timeout)
+                        except multiprocessing.TimeoutError:
+                            print(f"{name:>16} {n:>7} {solver:>12} "
+                                  f"{'timeout':>9}")
+                            continue
+                    print(f"{name:>16} {n:>7} {solver:>12} {seconds:>8.2f}s "
+                          f"{stats['nodes']:>8} {stats['backtracks']:>10} "
+                          f"{stats.get('restarts', '-'):>8} "
+                          f"{stats.get('backjumps', '-'):>9}"
+                          + ("" if solved else "  no solution"))
+
+
+def solve(structure, words, solver, seed=None):
+    """
+    Return the seconds taken to solve a crossword with `solver`, one of
+    `SOLVES`, the work done by the solver, and whether it found a
+    solution.
+    """
+    search, inference = SOLVES[solver]
+    creator = BitsetCrosswordCreator(Crossword(structure, words), inference)
+    start = time.perf_counter()
+    if search == "restarts":
+        assignment = creator.solve_restarts(seed)
+    else:
+        assignment = creator.solve()
+    seconds = time.perf_counter() - start
+    return seconds, creator.stats, assignment is not None
+
+
+def measure(creator_class, structure, words):
+    """
+    Return the seconds taken to load a crossword and create its
+    domains, the seconds taken to make it node and arc consistent, and
+    the creator.
+    """
+    start = time.perf_counter()
+    creator = creator_class(Crossword(structure, words))
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    creator.enforce_node_consistency()
+    creator.ac3()
+    seconds = time.perf_counter() - start
+    return load, seconds, creator
+
+
+def synthetic_words(n, seed=None, lengths=range(3, 16)):
+    """
+    Return `n` distinct random words, with lengths spread evenly over
+    `lengths` and letters drawn with English frequencies.
+    """
+    rng = random.Random(seed)
+    letters = list(LETTERS)
+    weights = list(LETTERS.values())
+    words = set()
+    while len(words) < n:
+        length = rng.choice(lengths)
+        words.add("".join(rng.choices(letters, weights, k=length)))
+    return sorted(words)
+
+
+def planted_words(structure, n, seed=None):
+    """
+    Return `n` random words with the lengths of the variables of the
+    crossword `structure`, together with the words of a fill of the
+    whole grid with random letters, so that the crossword can be solved.
+    """
+    with tempfile.TemporaryDirectory() as scratch:
+        empty = os.path.join(scratch, "words.txt")
+        open(empty, "w").close()
+        crossword = Crossword(structure, empty)
+
+    rng = random.Random(seed)
+    letters = list(LETTERS)
+    weights = list(LETTERS.values())
+    grid = [rng.choices(letters, weights, k=crossword.width)
+            for _ in range(crossword.height)]
+    planted = {
+        "".join(grid[i][j] for i, j in var.cells)
+        for var in crossword.variables
+    }
+    lengths = sorted({var.length for var in crossword.variables})
+    return sorted(planted.union(synthetic_words(n, seed, lengths)))
+
+
+def write_structures():
+    """
+    Write the structure of each size in `GRIDS` to data/.
+    """
+    os.makedirs(DATA, exist_ok=True)
+    for size in GRIDS:
+        path = os.path.join(DATA, f"structure{size}.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(newspaper_structure(size, seed=size)) + "\n")
+
+
+def newspaper_structure(size, density=0.16, block=4, seed=None,
+                        attempts=10000):
+    """
+    Return the rows of a `size` x `size` grid in the style of a newspaper
+    crossword: black squares placed symmetrically under a half turn,
+    about `density` of the squares black, every white square in an
+    across and a down word of at least three letters, all white squares
+    connected, and no `block` x `block` square of the grid all white.
+
+    Once `density` is reached, further black squares are only placed in
+    the squares that are still all white, so that no part of the grid is
+    left as an open stack of long words crossing each other.
+    """
+    rng = random.Random(seed)
+    white = [[True] * size for _ in range(size)]
+    target = int(density * size * size)
+    blacks = 0
+    for _ in range(attempts):
+        if blacks >= target:
+            remaining = open_squares(white, block)
+            if not remaining:
+                break
+            i, j = rng.choice(sorted(remaining))
+        else:
+            i, j = rng.randrange(size), rng.randrange(size)
+        cells = {(i, j), (size - 1 - i, size - 1 - j)}
+        if not all(white[a][b] for a, b in cells):
+            continue
+        for a, b in cells:
+            white[a][b] = False
+        if valid_structure(white):
+            blacks += len(cells)
+        else:
+            for a, b in cells:
+                white[a][b] = True
+    return ["".join("_" if cell else "#" for cell in row) for row in white]
+
+
+def open_squares(white, block):
+    """
+    Return the cells of the grid `white` that lie in a `block` x `block`
+    square of white squares.
+    """
+    size = len(white)
+    cells = set()
+    for i in range(size - block + 1):
+        for j in range(size - block + 1):
+            square = [(a, b) for a in range(i, i + block)
+                      for b in range(j, j + block)]
+            if all(white[a][b] for a, b in square):
+                cells.update(square)
+    return cells
+
+
+def valid_structure(white):
+    """
+    Return True if every run of white squares in the grid `white`,
+    across and down, is at least three long, and the white squares are
+    connected.
+    """
+    size = len(white)
+    for line in white + [list(column) for column in zip(*white)]:
+        run = 0
+        for cell in line + [False]:
+            if cell:
+                run += 1
+            else:
+                if 0 < run < 3:
+                    return False
+                run = 0
+
+    cells = [(i, j) for i in range(size) for j in range(size) if white[i][j]]
+    seen = {cells[0]}
+    queue = deque([cells[0]])
+    while queue:
+        i, j = queue.popleft()
+        for a, b in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+            if (0 <= a < size and 0 <= b < size and white[a][b]
+                    and (a, b) not in seen):
+                seen.add((a, b))
+                queue.append((a, b))
+    return len(seen) == len(cells)
+
+
+if __name__ == "__main__":
+    main()
@@ -61,6 +61,9 @@ class Crossword():
         with open(words_file) as f:
             self.words = set(f.read().upper().splitlines())
 
+        # Letter-position indexes of the words, by length, built on demand
+        self.indexes = dict()
+
         # Determine variable set
         self.variables = set()
         for i in range(self.height):
@@ -125,9 +128,135 @@ class Crossword():
                         cells2.index(intersection)
                     )
 
+        # Overlapping variables of each variable, so that neighbors do
+        # not rescan every variable
+        self.adjacency = {var: set() for var in self.variables}
+        for (v1, v2), overlap in self.overlaps.items():
+            if overlap is not None:
+                self.adjacency[v1].add(v2)
+
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
+        return set(self.adjacency[var])
+
+    def word_index(self, length):
+        """
+        Return the `WordIndex` of the words of the given length, built
+        the first time it is needed.
+        """
+        if length not in self.indexes:
+            self.indexes[length] = WordIndex(
+                (word for word in self.words if len(word) == length), length
+            )
+        return self.indexes[length]
+
+
+class WordIndex():
+
+    def __init__(self, words, length):
+        """
+        Number a set of words of the given length, and for every position
+        and letter, build the bitset of the numbers of words with that
+        letter at that position. Bitsets are Python integers where bit k
+        stands for word k. The set of words may be empty.
+        """
+        self.words = sorted(words)
+        self.ids = {word: k for k, word in enumerate(self.words)}
+        self.length = length
+        self.full = (1 << len(self.words)) - 1
+
+        # Set bits in byte arrays, then convert each to an integer once
+        size = (len(self.words) + 7) // 8
+        self.masks = []
+        for position in range(self.length):
+            bits = dict()
+            for k, word in enumerate(self.words):
+                letter = word[position]
+                if letter not in bits:
+                    bits[letter] = bytearray(size)
+                bits[letter][k >> 3] |= 1 << (k & 7)
+            self.masks.append({
+                letter: int.from_bytes(array, "little")
+                for letter, array in bits.items()
+            })
+
+    def __len__(self):
+        return len(self.words)
+
+    def words_of(self, mask):
+        """Return the words whose bits are set in `mask`, in order."""
+        words = []
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        for byte_number, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                words.append(self.words[
+                    8 * byte_number + low.bit_length() - 1
+                ])
+                byte ^= low
+        return words
+
+    def letters(self, mask, position):
+        """
+        Return the set of letters that the words in `mask` have at
+        `position`.
+        """
         return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
+            letter for letter, bits in self.masks[position].items()
+            if mask & bits
         )
+
+    def allowing(self, position, letters):
+        """
+        Return the bitset of words with any of `letters` at `position`.
+        """
+        mask = 0
+        for letter in letters:
+            mask |= self.masks[position].get(letter, 0)
+        return mask
+
+
+class BitDomain():
+
+    def __init__(self, index, mask=None):
+        """
+        Create a domain of words from a `WordIndex`, holding the words
+        whose bits are set in `mask`, or every word in the index.
+        The domain behaves like a set of words.
+        """
+        self.index = index
+        self.mask = index.full if mask is None else mask
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __iter__(self):
+        return iter(self.index.words_of(self.mask))
+
+    def __contains__(self, word):
+        k = self.index.ids.get(word)
+        return k is not None and bool(self.mask >> k & 1)
+
+    def __eq__(self, other):
+        if isinstance(other, BitDomain):
+            return self.index is other.index and self.mask == other.mask
+        return set(self) == set(other)
+
+    def __repr__(self):
+        return f"BitDomain({set(self)!r})"
+
+    def copy(self):
+        return BitDomain(self.index, self.mask)
+
+    def add(self, word):
+        self.mask |= 1 << self.index.ids[word]
+
+    def discard(self, word):
+        k = self.index.ids.get(word)
+        if k is not None:
+            self.mask &= ~(1 << k)
+
+    def remove(self, word):
+        if word not in self:
+            raise KeyError(word)
+        self.discard(word)
@@ -1,16 +1,70 @@
-import sys
+import argparse
+import heapq
+import random
+from collections import Counter, deque
 
 from crossword import *
 
+# Backtracks allowed in the first run of a search with restarts, scaled
+# by the Luby sequence for later runs
+RESTART_CUTOFF = 100
+
+# Entries per variable that the heap of variables may grow to before it
+# is rebuilt without the entries that are out of date
+HEAP_SLACK = 4
+
+
+class Restart(Exception):
+    """
+    Raised when a run of search has used up its backtracks.
+    """
+
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, inference="mac"):
         """
         Create new CSP crossword generate.
         """
         self.crossword = crossword
-        self.domains = {
+        self.domains = self.initial_domains()
+
+        # Inference after each assignment: "none", "forward" checking of
+        # the neighbors, or maintaining arc consistency ("mac")
+        self.inference = inference
+
+        # Values removed from domains during search, as (variable,
+        # removed values) pairs, undone when the search backs up
+        self.trail = []
+
+        # Variable whose assignment caused each change on the trail of
+        # each variable, or None for changes made before search
+        self.cause = None
+        self.pruners = {var: [] for var in self.crossword.variables}
+
+        # Number of assignments made before each variable was assigned,
+        # and the backtracks after which a search with restarts gives up
+        self.depth = dict()
+        self.cutoff = float("inf")
+
+        # Random tie-breaking for searches with restarts, and the weight
+        # of each variable by the dead ends it has been involved in
+        self.rng = None
+        self.weights = None
+
+        # Heap of variables by domain size and degree, kept during search
+        self.heap = None
+
+        # Work done by the solver
+        self.stats = {"revisions": 0, "pruned": 0, "nodes": 0,
+                      "backtracks": 0}
+
+    def initial_domains(self):
+        """
+        Return the domain of every variable before any constraint is
+        enforced: every word in the vocabulary.
+        """
+        return {
             var: self.crossword.words.copy()
             for var in self.crossword.variables
         }
@@ -91,6 +145,8 @@ class CrosswordCreator():
         """
         self.enforce_node_consistency()
         self.ac3()
+        self.clear_trail()
+        self.start_heap()
         a= self.backtrack(dict())
         #print(a)
         return a
@@ -119,16 +175,18 @@ class CrosswordCreator():
         ovrlp = self.crossword.overlaps[x,y]
         if ovrlp==None:
             return False
-        modified=False
+        removed = set()
         for worx in self.domains[x].copy():
             check = False
             for wory in self.domains[y]:
                 if wory[ovrlp[1]]==worx[ovrlp[0]]:
                     check = True
             if check==False:
-                modified=True
+                removed.add(worx)
                 self.domains[x].remove(worx)
-        return modified
+        if removed:
+            self.record(x, removed)
+        return len(removed) > 0
             
         #raise NotImplementedError
 
@@ -140,31 +198,41 @@ class CrosswordCreator():
 
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
+
+        Arcs wait in a first-in first-out queue, and an arc already in
+        the queue is not added again. Arcs into x are only queued again
+        when the domain of x shrinks, so the number of revisions is at
+        most the number of arcs plus, for every value removed from a
+        domain, the number of neighbors of its variable.
         """
-        if arcs==None:
-            arcs=[]
-            for i in self.crossword.variables:
-                for j in self.crossword.variables:
-                    if i == j:
-                        continue
-                    #print(i,j)#self.crossword.overlaps[i,j])
-                    if self.crossword.overlaps[i,j]!=None:
-                        arcs.append(tuple((i,j)))
-        check = True
-        while(check):
-            for arc in arcs:
-                if self.revise(arc[0],arc[1]):
-                    if  len(self.domains[arc[0]])==0:
-                        return False
-                    for n in self.crossword.neighbors(arc[0]):
-                        if n!=arc[1]:
-                            arcs.append(tuple((n,arc[0])))
-                arcs.remove(arc)
-            if len(arcs)==0:
-                check=False
+        if arcs is None:
+            arcs = [
+                (x, y)
+                for x in self.crossword.variables
+                for y in self.crossword.neighbors(x)
+            ]
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queue.append(arc)
+                queued.add(arc)
+
+        while queue:
+            x, y = queue.popleft()
+            queued.discard((x, y))
+            size = len(self.domains[x])
+            self.stats["revisions"] += 1
+            if self.revise(x, y):
+                self.stats["pruned"] += size - len(self.domains[x])
+                if len(self.domains[x]) == 0:
+                    self.bump(x, y)
+                    return False
+                for z in self.crossword.neighbors(x):
+                    if z != y and (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
         return True
-                
-        #raise NotImplementedError
 
     def assignment_complete(self, assignment):
         """
@@ -202,29 +270,49 @@ class CrosswordCreator():
         the number of values they rule out for neighboring variables.
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
-        """
-        sortedDomain=[]
 
-        for value in self.domains[var]:
-            modifiedAssignment={var:value}
-            modifiedAssignment.update(assignment)
-            num=self.noNeighboringValuesConstrained(modifiedAssignment)
-            sortedDomain.append([num,value])
-        sortedDomain.sort(key=self.countfunct)
-        return [row[1] for row in sortedDomain]
-        #return list(self.domains[var])
-        #raise NotImplementedError
+        The letters of each unassigned neighbor's domain at its overlap
+        with `var` are counted once, so each value is scored with one
+        lookup per neighbor.
+        """
+        counts = []
+        for other in self.crossword.neighbors(var):
+            if other not in assignment:
+                i, j = self.crossword.overlaps[var, other]
+                counts.append(
+                    (i, len(self.domains[other]), self.letter_counts(other, j))
+                )
+        if self.rng is not None:
+            return sorted(
+                self.domains[var],
+                key=lambda value: (self.noNeighboringValuesConstrained(
+                    var, value, counts), self.rng.random())
+            )
+        return sorted(
+            self.domains[var],
+            key=lambda value: self.noNeighboringValuesConstrained(
+                var, value, counts)
+        )
 
-    def noNeighboringValuesConstrained(self,var,assignment):
-        num=0
-        for i in self.crossword.neighbors(var):
-            overlapIndex=self.crossword.overlaps[var,i]
-            if overlapIndex is not None:
-                for value in self.domains[i]:
-                    if(assignment[var][overlapIndex[0]]!=value[overlapIndex[1]]):
-                        num+=1
+    def noNeighboringValuesConstrained(self, var, value, counts):
+        """
+        Return the number of values of the neighbors of `var` that
+        assigning `value` to it would rule out, given `counts`: for each
+        neighbor, the position of the overlap in `var`, the size of the
+        neighbor's domain, and how many of its values have each letter
+        at the overlap.
+        """
+        num = 0
+        for i, size, letters in counts:
+            num += size - letters.get(value[i], 0)
         return num
 
+    def letter_counts(self, var, position):
+        """
+        Return how many values in the domain of `var` have each letter
+        at `position`.
+        """
+        return Counter(word[position] for word in self.domains[var])
 
     def select_unassigned_variable(self, assignment):
         """
@@ -233,24 +321,71 @@ class CrosswordCreator():
         in its domain. If there is a tie, choose the variable with the highest
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
+
+        During search, variables wait in a heap keyed on domain size and
+        degree, with a new entry pushed whenever a domain changes or a
+        variable is unassigned, so entries that are out of date are
+        skipped rather than the heap being rebuilt.
         """
-        #listOfUnassignedVariable = []
-        list1 = []
-        for i in self.crossword.variables:
-            #print (i)
-            if i not in assignment:
-                count=0
-                for val in self.domains[i]:
-                    count+=1
-                list1.append((count,i))    
-        list1.sort(reverse=True,key=self.countfunct)
-        #print("yo",list1)
-        return list1[0][1]
+        if self.heap is None:
+            return min(
+                (var for var in self.crossword.variables
+                 if var not in assignment),
+                key=lambda var: (len(self.domains[var]),
+                                 -len(self.crossword.adjacency[var]))
+            )
+        while self.heap:
+            priority, _, var = self.heap[0]
+            if var not in assignment and priority == self.priority(var):
+                return var
+            heapq.heappop(self.heap)
+        return None
 
-        #raise NotImplementedError
+    def push(self, var):
+        """
+        Add an entry for `var` with its current domain size to the heap
+        of variables, if the search keeps one. Once the heap holds more
+        than `HEAP_SLACK` entries per variable, it is rebuilt with one.
+        """
+        if self.heap is None:
+            return
+        if len(self.heap) >= HEAP_SLACK * len(self.crossword.variables):
+            self.rebuild_heap()
+        else:
+            heapq.heappush(self.heap, (self.priority(var), self.ids[var], var))
+
+    def priority(self, var):
+        """
+        Return the key of `var` in the heap of variables: its domain
+        size, divided by its weight in a search with restarts, and then
+        its degree.
+        """
+        size = len(self.domains[var])
+        if self.weights is not None:
+            size /= self.weights[var]
+        return size, -len(self.crossword.adjacency[var])
+
+    def start_heap(self):
+        """
+        Build the heap of variables by domain size and degree. Ties
+        are broken at random in a search with restarts.
+        """
+        variables = sorted(self.crossword.variables, key=repr)
+        if self.rng is not None:
+            self.rng.shuffle(variables)
+        self.ids = {var: k for k, var in enumerate(variables)}
+        self.rebuild_heap()
 
-    def countfunct(self, e):
-        return e[0]
+    def rebuild_heap(self):
+        """
+        Replace the heap of variables with one entry for each variable,
+        keyed on its current domain size and degree.
+        """
+        self.heap = [
+            (self.priority(var), self.ids[var], var)
+            for var in self.crossword.variables
+        ]
+        heapq.heapify(self.heap)
 
     def backtrack(self, assignment):
         """
@@ -260,51 +395,422 @@ class CrosswordCreator():
         `assignment` is a mapping from variables (keys) to words (values).
 
         If no assignment is possible, return None.
+
+        Each value tried is checked only against the variables already
+        assigned that it overlaps. After an assignment, `infer` prunes
+        the remaining domains, and every pruned value is put back from
+        the trail when the search backs up.
         """
-        
         if self.assignment_complete(assignment):
             return assignment
-        #print(assignment)
         var = self.select_unassigned_variable(assignment)
-        #print(var)
-        #print(self.domains)
-        for value in self.domains[var]:
-            #print("value",value)
-            if self.consistent(assignment):
-                assignment[var]=value
+        for value in self.order_domain_values(var, assignment):
+            self.stats["nodes"] += 1
+            if not self.consistent_value(var, value, assignment):
+                continue
+            assignment[var] = value
+            mark = len(self.trail)
+            if self.infer(var, value, assignment):
                 result = self.backtrack(assignment)
-                if result != None:
+                if result is not None:
                     return result
-                assignment.pop(var)
+            self.undo(mark)
+            del assignment[var]
+            self.push(var)
+            self.stats["backtracks"] += 1
+            if self.stats["backtracks"] > self.cutoff:
+                raise Restart
         return None
 
-        
-        #raise NotImplementedError
+    def solve_restarts(self, seed=None, cutoff=RESTART_CUTOFF):
+        """
+        Enforce node and arc consistency, and then solve the CSP with
+        forward checking and conflict-directed backjumping, or with
+        chronological backtracking when maintaining arc consistency,
+        breaking ties between variables and between values at random.
+        Variables are ordered by domain size over weight, and the weights
+        of the variables in each dead end grow, carried across runs.
+
+        A run that backtracks more than its limit is abandoned and the
+        search starts again in a new random order. The limits follow the
+        Luby sequence times `cutoff`, which grows without bound, so the
+        search is still complete.
+        """
+        self.rng = random.Random(seed)
+        self.weights = {
+            var: len(self.crossword.adjacency[var]) + 1
+            for var in self.crossword.variables
+        }
+        self.stats.update(restarts=0, backjumps=0)
+        self.enforce_node_consistency()
+        if not self.ac3():
+            return None
+        self.clear_trail()
+
+        run = 0
+        while True:
+            run += 1
+            self.cutoff = self.stats["backtracks"] + cutoff * luby(run)
+            self.start_heap()
+            try:
+                if self.inference == "mac":
+                    return self.backtrack(dict())
+                return self.backjump(dict(), 0)[0]
+            except Restart:
+                self.undo(0)
+                self.cause = None
+                self.stats["restarts"] += 1
+
+    def backjump(self, assignment, depth):
+        """
+        Search from `assignment`, made of `depth` assignments, with
+        forward checking and conflict-directed backjumping.
+
+        Return a complete assignment, or None together with the variable
+        to jump back to and the variables to blame for the failure. The
+        search backs up past every variable that could not have caused
+        it, and reports no variable to jump back to when no assignment
+        could have been to blame, since then there is no solution.
+        """
+        if self.assignment_complete(assignment):
+            return assignment, None, set()
+        var = self.select_unassigned_variable(assignment)
+        conflicts = set()
+        for value in self.order_domain_values(var, assignment):
+            self.stats["nodes"] += 1
+            if not self.consistent_value(var, value, assignment):
+                conflicts.update(
+                    other for other in assignment
+                    if assignment[other] == value
+                    or other in self.crossword.adjacency[var]
+                )
+                continue
+            assignment[var] = value
+            self.depth[var] = depth
+            mark = len(self.trail)
+            self.cause = var
+            wiped = self.forward_check(var, value, assignment)
+            self.cause = None
+            if wiped is None:
+                result, target, blame = self.backjump(assignment, depth + 1)
+                if result is not None:
+                    return result, None, set()
+                if target is None or target != var:
+                    self.undo(mark)
+                    del assignment[var]
+                    self.push(var)
+                    return None, target, blame
+                conflicts |= blame
+            else:
+                conflicts |= self.culprits(wiped, assignment) - {var}
+                self.bump(var, wiped)
+            self.undo(mark)
+            del assignment[var]
+            self.push(var)
+            self.stats["backtracks"] += 1
+            if self.stats["backtracks"] > self.cutoff:
+                raise Restart
+
+        # Values of `var` were also ruled out by earlier assignments
+        conflicts |= self.culprits(var, assignment)
+        if not conflicts:
+            return None, None, set()
+        target = max(conflicts, key=self.depth.get)
+        self.stats["backjumps"] += depth - 1 - self.depth[target]
+        conflicts.discard(target)
+        return None, target, conflicts
+
+    def culprits(self, var, assignment):
+        """
+        Return the assigned variables whose assignments removed values
+        from the domain of `var`.
+        """
+        return {
+            cause for cause in self.pruners[var]
+            if cause is not None and cause in assignment
+        }
+
+    def bump(self, x, y):
+        """
+        Add to the weights of `x` and `y`, in a search with restarts,
+        after a dead end in which the domain of one emptied as it was
+        revised against the other.
+        """
+        if self.weights is not None:
+            self.weights[x] += 1
+            self.weights[y] += 1
+
+    def consistent_value(self, var, value, assignment):
+        """
+        Return True if assigning `value` to `var` keeps a consistent
+        `assignment` consistent: the word is not used elsewhere and
+        agrees with every assigned variable it overlaps.
+        """
+        if value in assignment.values():
+            return False
+        for other in self.crossword.neighbors(var):
+            if other in assignment:
+                i, j = self.crossword.overlaps[var, other]
+                if value[i] != assignment[other][j]:
+                    return False
+        return True
+
+    def infer(self, var, value, assignment):
+        """
+        Prune domains after `value` is assigned to `var`, recording every
+        removal on the trail. The domain of `var` becomes just `value`,
+        and no other unassigned variable may use the same word. Then,
+        with forward checking, the unassigned neighbors of `var` are
+        revised against it; maintaining arc consistency goes on to
+        propagate those revisions with AC-3.
+
+        Return False if some domain becomes empty.
+        """
+        changed = [var]
+        wiped = self.forward_check(var, value, assignment, changed,
+                                   self.inference == "forward")
+        if wiped is not None:
+            self.bump(var, wiped)
+            return False
+        if self.inference == "mac":
+            return self.ac3([
+                (other, x)
+                for x in changed
+                for other in self.crossword.neighbors(x)
+                if other not in assignment
+            ])
+        return True
+
+    def forward_check(self, var, value, assignment, changed=None,
+                      neighbors=True):
+        """
+        Reduce the domain of `var` to `value`, take `value` out of the
+        domains of the other unassigned variables, and, if `neighbors`,
+        revise the unassigned neighbors of `var` against it, recording
+        every removal on the trail. Variables whose domains shrink are
+        appended to `changed`.
+
+        Return the first variable whose domain becomes empty, or None.
+        """
+        if changed is None:
+            changed = []
+        self.reduce_domain(var, value)
+        for other in self.crossword.variables:
+            if (other not in assignment and other.length == var.length
+                    and value in self.domains[other]):
+                self.remove_value(other, value)
+                if len(self.domains[other]) == 0:
+                    return other
+                changed.append(other)
+
+        if neighbors:
+            for other in self.crossword.neighbors(var):
+                if other not in assignment:
+                    size = len(self.domains[other])
+                    self.stats["revisions"] += 1
+                    if self.revise(other, var):
+                        self.stats["pruned"] += size - len(self.domains[other])
+                        if len(self.domains[other]) == 0:
+                            return other
+        return None
+
+    def reduce_domain(self, var, value):
+        """
+        Remove every value but `value` from the domain of `var`.
+        """
+        removed = set(self.domains[var])
+        removed.discard(value)
+        self.domains[var].intersection_update({value})
+        if removed:
+            self.record(var, removed)
+
+    def remove_value(self, var, value):
+        """
+        Remove `value` from the domain of `var`.
+        """
+        self.domains[var].remove(value)
+        self.record(var, {value})
+
+    def restore(self, var, removed):
+        """
+        Put values removed from the domain of `var` back.
+        """
+        self.domains[var].update(removed)
+
+    def record(self, var, removed):
+        """
+        Record on the trail that `removed` was taken out of the domain
+        of `var`.
+        """
+        self.trail.append((var, removed))
+        self.pruners[var].append(self.cause)
+        self.push(var)
+
+    def undo(self, mark):
+        """
+        Undo every domain change recorded on the trail after `mark`.
+        """
+        while len(self.trail) > mark:
+            var, removed = self.trail.pop()
+            self.pruners[var].pop()
+            self.restore(var, removed)
+            self.push(var)
+
+    def clear_trail(self):
+        """
+        Forget the changes on the trail, keeping them in the domains.
+        """
+        self.trail.clear()
+        for causes in self.pruners.values():
+            causes.clear()
+
+
+class BitsetCrosswordCreator(CrosswordCreator):
+
+    def initial_domains(self):
+        """
+        Return the domain of every variable as a `BitDomain` over the
+        word index of its length, so that revising an arc takes a few
+        bitwise operations per letter rather than a comparison of every
+        pair of words.
+        """
+        return {
+            var: BitDomain(self.crossword.word_index(var.length))
+            for var in self.crossword.variables
+        }
+
+    def enforce_node_consistency(self):
+        """
+        Domains only ever hold words of the variable's length, so they
+        are node-consistent from the start.
+        """
+        return
+
+    def revise(self, x, y):
+        """
+        Make variable `x` arc consistent with variable `y`, keeping only
+        the words of `x` with a letter at the overlap that some word of
+        `y` has there.
+
+        Return True if a revision was made to the domain of `x`; return
+        False if no revision was made.
+        """
+        overlap = self.crossword.overlaps[x, y]
+        if overlap is None:
+            return False
+        i, j = overlap
+        domain_x, domain_y = self.domains[x], self.domains[y]
+        letters = domain_y.index.letters(domain_y.mask, j)
+        mask = domain_x.mask & domain_x.index.allowing(i, letters)
+        if mask == domain_x.mask:
+            return False
+        removed = domain_x.mask & ~mask
+        domain_x.mask = mask
+        self.record(x, removed)
+        return True
+
+    def reduce_domain(self, var, value):
+        domain = self.domains[var]
+        bit = 1 << domain.index.ids[value]
+        if domain.mask != bit:
+            removed = domain.mask & ~bit
+            domain.mask = bit
+            self.record(var, removed)
+
+    def remove_value(self, var, value):
+        domain = self.domains[var]
+        bit = 1 << domain.index.ids[value]
+        domain.mask &= ~bit
+        self.record(var, bit)
+
+    def restore(self, var, removed):
+        self.domains[var].mask |= removed
+
+    def letter_counts(self, var, position):
+        domain = self.domains[var]
+        return {
+            letter: (domain.mask & bits).bit_count()
+            for letter, bits in domain.index.masks[position].items()
+        }
+
+
+# Inference done after each assignment during search
+INFERENCES = ["none", "forward", "mac"]
+
+CREATORS = {
+    "set": CrosswordCreator,
+    "bitset": BitsetCrosswordCreator
+}
+
+# Search after consistency is enforced: chronological backtracking with
+# the chosen inference, or randomized restarts, with conflict-directed
+# backjumping unless arc consistency is maintained
+SOLVERS = ["backtrack", "restarts"]
+
+
+def luby(i):
+    """
+    Return term `i` of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...,
+    counting from 1.
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
 
 
 def main():
 
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
-
-    # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(
+        usage="python generate.py structure words [output] "
+              "[--domains DOMAINS] [--inference INFERENCE] "
+              "[--solver SOLVER] [--seed SEED] [--stats]"
+    )
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--domains", choices=CREATORS, default="set",
+                        help="keep domains as sets of words, or as bitsets "
+                             "over an index of letter positions")
+    parser.add_argument("--inference", choices=INFERENCES, default="mac",
+                        help="prune domains after each assignment by "
+                             "forward checking or maintaining arc "
+                             "consistency")
+    parser.add_argument("--solver", choices=SOLVERS, default="backtrack",
+                        help="backtrack chronologically, or restart in a "
+                             "new random order when a run backtracks too "
+                             "often, backjumping with forward checking "
+                             "unless the inference is mac")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed for the restarts solver")
+    parser.add_argument("--stats", action="store_true",
+                        help="report the work done by the solver")
+    args = parser.parse_args()
 
     # Generate crossword
-    crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    crossword = Crossword(args.structure, args.words)
+    creator = CREATORS[args.domains](crossword, args.inference)
+    if args.solver == "restarts":
+        assignment = creator.solve_restarts(args.seed)
+    else:
+        assignment = creator.solve()
 
     # Print result
     if assignment is None:
         print("No solution.")
     else:
         creator.print(assignment)
-        if output:
-            creator.save(assignment, output)
+        if args.output:
+            creator.save(assignment, args.output)
+    if args.stats:
+        for name, value in creator.stats.items():
+            print(f"{name.capitalize()}: {value}")
 
 
 if __name__ == "__main__":